@@ -2,95 +2,321 @@ import streamlit as st
 import re
 import random
 import json
-import matplotlib.pyplot as plt
-import numpy as np
+import io
+import time
+import secrets
+import threading
 from colors import COLORS
-from utils import generate_palette
+from utils import generate_palette, generate_packed, LARGE_SIZES, GENERATION_SPACES, style_names, is_cacheable, regenerate_unlocked, palette_diff
+from render import DISPLAY_STYLES, MPL_RENDERERS, CELL_RENDERERS, HTML_RENDERERS, render_png, PREVIEW_DPI, CANVAS_MODES, canvas_html
+import profiler
+from library import ColorLibrary
+from export import write_zip
+from importer import READERS, detect_format, import_colors
+from similarity import PaletteIndex
+from shared_cache import default_cache, make_key
+from colormap import RAMP_SIZES, SPACES, ramp, to_cpt, to_css_stops, to_lut_bytes
+from scoring import best_of_n
+from materialize import MaterializedTable
+from palette_id import palette_id, encode_state, decode_state
+from harmony_fit import HueIndex, fit_palette
+from prefetch import Prefetcher, neighbor_states
+from session_store import PaletteStore, PaletteHistory, CustomColors, INDEX_LIMIT, set_usage_hook, usage_totals
+from colorspace import hex_to_rgb_array
+from sweep import SWEEP_PARAMS, FORMATS as SWEEP_FORMATS, EXTENSIONS as SWEEP_EXTENSIONS, sweep_palettes
+from tokens import TokenScales, build_scales, contrast, to_css as tokens_css, to_json as tokens_json
+
+_rerun_start = time.perf_counter()
+
+# Cache shared by every worker process on this host
+@st.cache_resource
+def get_shared_cache():
+    return default_cache()
+
+# Deterministic styles precomputed over the slider grid by materialize.py
+@st.cache_resource
+def _materialized_table():
+    return MaterializedTable()
+
+def get_materialized():
+    table = _materialized_table()
+    table.reload_if_changed()
+    return table
+
+# 50-900 token scales for the whole library; refresh() only recomputes changed colors
+@st.cache_resource
+def get_token_scales():
+    return TokenScales(), threading.Lock()
+
+# Background workers filling the shared cache with neighboring slider states
+@st.cache_resource
+def get_prefetcher():
+    return Prefetcher(get_shared_cache())
+
+# Slider values are rounded so prefetched neighbors (x ± 0.05) hit the same keys
+def palette_key(base_hex, style, num_colors, hue_shift, saturation_boost, space):
+    return make_key('palette', base_hex.upper(), style, num_colors, round(hue_shift, 4), round(saturation_boost, 4), space)
 
 # Cache palette generation
 @st.cache_data
-def cached_generate_palette(base_hex, style, num_colors, hue_shift=0.1, saturation_boost=0.5):
+def cached_generate_palette(base_hex, style, num_colors, hue_shift=0.1, saturation_boost=0.5, space='hsl'):
+    # Body only runs on a cache miss
+    profiler.count('palette.cache_misses')
     try:
-        return generate_palette(base_hex, style, num_colors, hue_shift, saturation_boost)
+        key = palette_key(base_hex, style, num_colors, hue_shift, saturation_boost, space)
+        def compute():
+            with profiler.timer(f'generate.{style}'):
+                return generate_palette(base_hex, style, num_colors, hue_shift, saturation_boost, space)
+        palette = get_shared_cache().get_or_compute_json(key, compute)[0]
+        get_prefetcher().claim(key)
+        return palette
     except Exception as e:
         st.error(f"Palette generation failed: {str(e)}")
         return [base_hex]
 
+# Matplotlib previews as PNG bytes, shared across workers; the DPI is part of
+# the key so a resolution change never serves stale images
+def preview_key(display_style, palette):
+    return f"preview:{display_style}:{PREVIEW_DPI}:{palette_id(palette)}"
+
+def preview_png(display_style, palette):
+    key = preview_key(display_style, palette)
+    png = get_shared_cache().get_or_compute(key, lambda: render_png(display_style, palette))[0]
+    get_prefetcher().claim(key)
+    return png
+
+def prefetch_neighbors(base_hex, style, num_colors, hue_shift, saturation_boost, space, display_style):
+    # Palettes (and Matplotlib previews) one slider step or one style away, at low cache priority
+    state = (base_hex, style, num_colors, hue_shift, saturation_boost, space, display_style)
+    if state == st.session_state.get('prefetched_state'):
+        return
+    st.session_state.prefetched_state = state
+    table = get_materialized()
+
+    def task(style, n, h, s):
+        def run(fetch):
+            palette = table.lookup(style, base_hex, n, h, s) if space == 'hsl' else None
+            if palette is None:
+                key = palette_key(base_hex, style, n, h, s, space)
+                palette = json.loads(fetch(key, lambda: json.dumps(generate_palette(base_hex, style, n, h, s, space)).encode('utf-8')))
+            if display_style in MPL_RENDERERS:
+                fetch(preview_key(display_style, palette), lambda: render_png(display_style, palette))
+        return run
+    tasks = [task(*n) for n in neighbor_states(style, num_colors, hue_shift, saturation_boost, style_names())]
+    get_prefetcher().schedule(st.session_state.session_id, tasks)
+
+def get_palette(base_hex, style, num_colors, hue_shift=0.1, saturation_boost=0.5, best_of=1, space='hsl', seed=None):
+    # Randomized styles would return the same draw forever if memoized
+    if not is_cacheable(style):
+        profiler.count('palette.uncached')
+        if best_of > 1:
+            with profiler.timer(f'generate.best_of.{style}'):
+                return best_of_n(base_hex, style, num_colors, hue_shift, saturation_boost, n=best_of, seed=seed, space=space)[0][0]
+        with profiler.timer(f'generate.{style}'):
+            return generate_palette(base_hex, style, num_colors, hue_shift, saturation_boost, space, seed)
+    profiler.count('palette.requests')
+    with profiler.timer('palette.lookup'):
+        # The materialized table is built in the default HSL space
+        if space == 'hsl':
+            palette = get_materialized().lookup(style, base_hex, num_colors, hue_shift, saturation_boost)
+            if palette is not None:
+                profiler.count('palette.materialized')
+                return palette
+        return cached_generate_palette(base_hex, style, num_colors, hue_shift, saturation_boost, space)
+
+# Library name lookup for a hex code
+def color_name(hex_str, default="Generated"):
+    profiler.count('name_lookup.calls')
+    with profiler.timer('name_lookup'):
+        return library.name_of(hex_str, default)
+
+# Emit an HTML block and record its size
+def render_html(html, key):
+    profiler.count(f'html.bytes.{key}', len(html))
+    profiler.count('html.bytes_total', len(html))
+    st.markdown(html, unsafe_allow_html=True)
+
+# Rebuild only the swatch cells that changed since the last render
+def swatch_cells(palette, display_style):
+    cache = st.session_state.swatch_cells
+    if cache.get('key') != (display_style, library.version):
+        cache.update(key=(display_style, library.version), palette=[], cells=[])
+    changed = palette_diff(cache['palette'], palette)
+    cells = (cache['cells'] + [None] * len(palette))[:len(palette)]
+    for i in changed:
+        if i < len(palette):
+            cells[i] = CELL_RENDERERS[display_style](palette[i], color_name)
+    profiler.count('swatches.rebuilt', len(changed))
+    profiler.count('swatches.reused', len(palette) - len(changed))
+    cache.update(palette=list(palette), cells=cells)
+    return cells
+
+# Derived library data, rebuilt only when the library version changes
+def _derived(name, build):
+    cache = st.session_state.derived
+    hit = cache.get(name)
+    if hit is not None and hit[0] == library.version:
+        return hit[1]
+    profiler.count(f'derived.rebuild.{name}')
+    with profiler.timer(f'derived.{name}'):
+        value = build()
+    cache[name] = (library.version, value)
+    return value
+
+def library_view():
+    def build():
+        base_options = {c['name']: c['hex'] for c in all_colors}
+        return base_options, list(base_options)
+    return _derived('base_options', build)
+
+def library_html():
+    def build():
+        parts = ["<div class='library-grid'>"]
+        parts += [f"<div class='palette-box' style='background:{color['hex']}; padding:10px; color:white; font-size:11px;'><b>{color['name']}</b><br>{color['hex']}<br>Vibe: {color['vibe']}</div>" for color in all_colors]
+        parts.append("</div>")
+        return "".join(parts)
+    return _derived('library_html', build)
+
+# Shareable state: ?p=<token> carries the colors and the settings that made
+# them, so a link never depends on anything the server might have evicted
+def publish_palette(palette, style, base_hex, num_colors, hue_shift, saturation_boost, space='hsl', seed=None):
+    token = encode_state(palette, style, base_hex, num_colors, hue_shift, saturation_boost, space, seed)
+    st.session_state.palette_token = token
+    st.session_state.restored_token = token
+    st.query_params['p'] = token
+    return token
+
+def restore_from_query():
+    token = st.query_params.get('p')
+    if not token or token == st.session_state.get('restored_token'):
+        return
+    st.session_state.restored_token = token
+    try:
+        state = decode_state(token)
+    except ValueError:
+        st.warning("Ignoring an invalid palette link.")
+        return
+    profiler.count('palette.restored')
+    _seed_widgets(state)
+    set_palette(state['palette'])
+    st.session_state.palette_token = token
+
+# Point the workspace widgets (keyed below) at the settings behind a palette,
+# so the sidebar matches it. Runs before the widgets render.
+def _seed_widgets(state):
+    base_options, _ = library_view()
+    base_name = library.name_of(state['base_hex'], None)
+    if base_name not in base_options:
+        # A base outside the library is offered under its hex (see _base_choices)
+        st.session_state.loaded_base = base_name = state['base_hex']
+    st.session_state.base_name = base_name
+    if state['style'] in style_names():
+        st.session_state.style = state['style']
+    if 3 <= state['num_colors'] <= 20:
+        st.session_state.num_colors = state['num_colors']
+    st.session_state.hue_shift = state['hue_shift']
+    st.session_state.saturation_boost = state['saturation_boost']
+    st.session_state.space = state['space']
+
 # Validate hex code
 def is_valid_hex(hex_str):
     return bool(re.match(r'^#[0-9A-Fa-f]{6}$', hex_str))
 
-# Convert hex to RGB for Matplotlib
-def hex_to_rgb_mpl(hex_str):
-    hex_str = hex_str.lstrip('#')
-    return tuple(int(hex_str[i:i+2], 16) / 255.0 for i in (0, 2, 4))
-
-# Matplotlib rendering functions
-def render_rainbow_arc(palette):
-    fig, ax = plt.subplots(figsize=(6, 3))
-    for i, color in enumerate(palette):
-        ax.add_patch(plt.Rectangle((i * 0.2, 0), 0.2, 1, color=hex_to_rgb_mpl(color)))
-    ax.set_xlim(0, len(palette) * 0.2)
-    ax.set_ylim(0, 1)
-    ax.axis('off')
-    return fig
-
-def render_hexagon_grid(palette):
-    fig, ax = plt.subplots(figsize=(6, 6))
-    for i, color in enumerate(palette):
-        row = i // 5
-        col = i % 5
-        hexagon = plt.Polygon([
-            (col + 0.5, row + 0.866), (col + 1, row + 0.5), (col + 1, row),
-            (col + 0.5, row - 0.866), (col, row - 0.5), (col, row)
-        ], facecolor=hex_to_rgb_mpl(color))
-        ax.add_patch(hexagon)
-    ax.set_xlim(-0.5, 5.5)
-    ax.set_ylim(-1, len(palette) // 5 + 1)
-    ax.axis('off')
-    return fig
-
-def render_spiral_swirl(palette):
-    fig, ax = plt.subplots(figsize=(6, 6))
-    for i, color in enumerate(palette):
-        angle = i * 137.5 * np.pi / 180  # Golden angle
-        radius = 0.5 * np.sqrt(i + 1)
-        x = 3 + radius * np.cos(angle)
-        y = 3 + radius * np.sin(angle)
-        ax.add_patch(plt.Circle((x, y), 0.3, color=hex_to_rgb_mpl(color)))
-    ax.set_xlim(0, 6)
-    ax.set_ylim(0, 6)
-    ax.axis('off')
-    return fig
-
-def render_color_wheel(palette):
-    fig, ax = plt.subplots(figsize=(6, 6))
-    for i, color in enumerate(palette):
-        angle = i * 2 * np.pi / len(palette)
-        x = 3 + 2 * np.cos(angle)
-        y = 3 + 2 * np.sin(angle)
-        ax.add_patch(plt.Circle((x, y), 0.5, color=hex_to_rgb_mpl(color)))
-    ax.set_xlim(0, 6)
-    ax.set_ylim(0, 6)
-    ax.axis('off')
-    return fig
+# The current palette changes only through here, so every change can be undone
+def set_palette(palette):
+    st.session_state.palette_history.record(st.session_state.palette, palette)
+    st.session_state.palette = palette
+
+# History steps don't record the settings behind them, so the link for an
+# undone or redone palette carries the sidebar's current ones
+def _republish():
+    palette = st.session_state.palette
+    if not palette:
+        st.session_state.palette_token = None
+        st.query_params.pop('p', None)
+        return
+    base_options, base_names = _base_choices()
+    publish_palette(palette, st.session_state.get('style', style_names()[0]),
+                    base_options.get(st.session_state.get('base_name'), base_options[base_names[0]]), len(palette),
+                    st.session_state.hue_shift, st.session_state.saturation_boost, st.session_state.get('space', GENERATION_SPACES[0]))
+
+# Library colors, plus the base of a loaded link or fit when it isn't one of them
+def _base_choices():
+    base_options, base_names = library_view()
+    extra = st.session_state.get('loaded_base')
+    if extra and extra not in base_options:
+        base_options = {**base_options, extra: extra}
+        base_names = base_names + [extra]
+    return base_options, base_names
+
+def _use_fit(fit):
+    # Harmony fits are searched in the default working space
+    state = dict(fit, space=GENERATION_SPACES[0])
+    _seed_widgets(state)
+    set_palette(fit['palette'])
+    publish_palette(fit['palette'], fit['style'], fit['base_hex'], fit['num_colors'],
+                    fit['hue_shift'], fit['saturation_boost'], state['space'])
+
+def _undo():
+    st.session_state.palette = st.session_state.palette_history.undo(st.session_state.palette)
+    _republish()
+
+def _redo():
+    st.session_state.palette = st.session_state.palette_history.redo(st.session_state.palette)
+    _republish()
+
+# Session memory across every live session of this worker. Sums arrive with
+# every change; the largest session is only worked out for the debug panel.
+def _report_session_usage(kind, totals):
+    profiler.gauge(f'session.{kind}.sessions', totals['sessions'])
+    profiler.gauge(f'session.{kind}.memory_bytes_sum', totals['memory_bytes_sum'])
+    profiler.gauge(f'session.{kind}.disk_bytes_sum', totals['disk_bytes_sum'])
+    if 'memory_bytes_max' in totals:
+        profiler.gauge(f'session.{kind}.memory_bytes_max', totals['memory_bytes_max'])
+
+set_usage_hook(_report_session_usage)
 
 # Session state
 if 'custom_colors' not in st.session_state:
-    st.session_state.custom_colors = []
+    st.session_state.custom_colors = CustomColors()
 if 'saved_palettes' not in st.session_state:
-    st.session_state.saved_palettes = []
+    st.session_state.saved_palettes = PaletteStore()
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = secrets.token_hex(8)
+if 'palette_history' not in st.session_state:
+    st.session_state.palette_history = PaletteHistory()
 if 'palette' not in st.session_state:
     st.session_state.palette = None
 if 'show_library' not in st.session_state:
     st.session_state.show_library = False
 if 'display_style' not in st.session_state:
     st.session_state.display_style = 'rectangle_bars'
+if 'swatch_cells' not in st.session_state:
+    st.session_state.swatch_cells = {}
+if 'palette_index' not in st.session_state:
+    st.session_state.palette_index = PaletteIndex(limit=INDEX_LIMIT)
+if 'derived' not in st.session_state:
+    st.session_state.derived = {}
+if 'palette_token' not in st.session_state:
+    st.session_state.palette_token = None
+if 'large_palette' not in st.session_state:
+    st.session_state.large_palette = None  # packed RGB bytes
+# Slider defaults live here rather than in the widgets, so a restored link can set them
+for key, default in (('num_colors', 5), ('hue_shift', 0.1), ('saturation_boost', 0.5)):
+    if key not in st.session_state:
+        st.session_state[key] = default
+
+if 'library' not in st.session_state:
+    st.session_state.library = ColorLibrary(COLORS + list(st.session_state.custom_colors))
 
-all_colors = COLORS + st.session_state.custom_colors
+library = st.session_state.library
+all_colors = library.colors
+
+restore_from_query()
 
 # Custom CSS for HTML-based styles
-st.markdown("""
+with profiler.timer('rerun.css'):
+    st.markdown("""
 <style>
 .stApp { 
     background: linear-gradient(135deg, #FF6B6B, #4ECDC4, #45B7D1);
@@ -133,188 +359,291 @@ with st.sidebar:
     custom_hex = st.color_picker("Color", "#FF6B6B")
     if st.button("Add"):
         if custom_name and is_valid_hex(custom_hex):
-            st.session_state.custom_colors.append({'name': custom_name, 'hex': custom_hex.upper(), 'vibe': 'Custom', 'why_underrated': 'User Creation'})
-            st.success(f"Added {custom_name}!")
+            entry = {'name': custom_name, 'hex': custom_hex.upper(), 'vibe': 'Custom', 'why_underrated': 'User Creation'}
+            try:
+                st.session_state.custom_colors.append(entry)
+                # Custom colors belong to this session, so they stay out of the
+                # materialized table and go through the shared cache instead
+                library.add([entry])
+                st.success(f"Added {custom_name}!")
+            except ValueError as e:
+                st.error(str(e))
         else:
             st.error("Please enter a valid hex code (#RRGGBB)")
+    
+    st.header("Import Colors")
+    upload = st.file_uploader("CSV, JSON or GPL color list", type=list(READERS))
+    if upload is not None and st.button("Import"):
+        try:
+            with profiler.timer('import.colors'):
+                stats = import_colors(library, upload, detect_format(upload.name), upload.name)
+            st.success(f"Added {stats['added']} colors ({stats['duplicates']} duplicates, {stats['invalid']} invalid skipped)")
+        except Exception as e:
+            st.error(f"Import failed: {str(e)}")
+
+    # Inverse search: which style and base color reproduce a pasted palette
+    st.header("Identify Palette")
+    pasted = st.text_area("Hex colors", placeholder="#45B1E8 #E87E45 #B1E845")
+    if st.button("Identify"):
+        target = [h if h.startswith('#') else f"#{h}" for h in re.findall(r'#?[0-9A-Fa-f]{6}\b', pasted)]
+        if target:
+            with profiler.timer('harmony_fit'):
+                st.session_state.fits = fit_palette(target, k=3, index=_derived('hue_index', lambda: HueIndex(all_colors)),
+                                                    lookup=get_materialized().lookup)
+        else:
+            st.error("Paste at least one #RRGGBB color")
+    for i, fit in enumerate(st.session_state.get('fits') or []):
+        swatches = "".join(f"<div style='background:{c}; flex:1; height:20px;'></div>" for c in fit['palette'])
+        st.markdown(f"**{fit['style'].replace('_', ' ')}** of {library.name_of(fit['base_hex'], fit['base_hex'])} · "
+                    f"hue shift {fit['hue_shift']:.2f} · saturation {fit['saturation_boost']:.2f} · ΔE {fit['delta_e']:.1f}"
+                    f"<div style='display:flex;'>{swatches}</div>", unsafe_allow_html=True)
+        st.button("Use this palette", key=f"use_fit_{i}", on_click=_use_fit, args=(fit,))
+
     st.metric("Total Colors", len(all_colors))
     st.metric("Custom Colors", len(st.session_state.custom_colors))
 
 # MAIN
-col1, col2 = st.columns([1, 2])
+# Each section is a fragment: a widget change reruns only its own section
+@st.fragment
+def palette_workspace():
+    with profiler.timer('rerun.fragment.workspace'):
+        _palette_workspace()
+
+def _reroll(palette, locked, base_hex, style, hue_shift, saturation_boost, space):
+    with profiler.timer(f'reroll.{style}'):
+        set_palette(regenerate_unlocked(palette, locked, base_hex, style, hue_shift, saturation_boost, space))
+    publish_palette(st.session_state.palette, style, base_hex, len(palette), hue_shift, saturation_boost, space)
+
+def _large_workspace(col, base_hex, style, num_colors, hue_shift, saturation_boost, space, mode):
+    # Large palettes stay packed bytes end to end; the canvas decodes them client-side
+    if st.button("Generate Palette"):
+        with profiler.timer(f'generate.packed.{style}'):
+            st.session_state.large_palette = generate_packed(base_hex, style, num_colors, hue_shift, saturation_boost, space=space).tobytes()
+    packed = st.session_state.large_palette
+    if not packed:
+        return
+    with col:
+        st.header(f"{style.replace('_', ' ').upper()} · {len(packed) // 3} colors")
+        with profiler.timer(f'render.canvas.{mode}'):
+            st.html(canvas_html(packed, mode), unsafe_allow_javascript=True)
+        st.download_button("Download raw RGB", packed, f"palette_{len(packed) // 3}.rgb")
+
+def _palette_workspace():
+    col1, col2 = st.columns([1, 2])
 
-with col1:
-    st.header("Select Base")
-    base_options = {c['name']: c['hex'] for c in all_colors}
-    selected_name = st.selectbox("Base Color", list(base_options.keys()))
-    base_hex = base_options[selected_name]
+    with col1:
+        st.header("Select Base")
+        base_options, base_names = _base_choices()
+        selected_name = st.selectbox("Base Color", base_names, key="base_name")
+        base_hex = base_options[selected_name]
     
-    st.markdown(f"<div class='palette-box' style='background-color:{base_hex}; width:100%; height:80px; display:flex; align-items:center; justify-content:center; color:white; font-weight:bold;'>{selected_name}</div>", unsafe_allow_html=True)
+        st.markdown(f"<div class='palette-box' style='background-color:{base_hex}; width:100%; height:80px; display:flex; align-items:center; justify-content:center; color:white; font-weight:bold;'>{selected_name}</div>", unsafe_allow_html=True)
     
-    style = st.selectbox("Style", [
-        'random', 'complementary', 'analogous', 'triadic', 'monochrome', 'wes_anderson', 
-        'warm', 'cool', 'pastel', 'vibrant', 'earth_tones', 'split_complementary', 
-        'tetradic', 'square', 'gradient', 'shades', 'tints', 'tones', 'neutral', 
-        'high_contrast', 'split_analogous', 'double_complementary', 'golden_ratio', 
-        'random_harmony', 'biomimicry'
-    ])
-    num_colors = st.slider("Number of Colors", 3, 20, 5)
-    hue_shift = st.slider("Hue Shift Range", 0.0, 1.0, 0.1, help="Controls hue variation")
-    saturation_boost = st.slider("Saturation Boost", 0.0, 1.0, 0.5, help="Adjusts color intensity")
-    display_style = st.selectbox("Display Style", [
-        'rectangle_bars', 'hexagon_grid', 'spiral_swirl', 'color_wheel', 
-        'rainbow_arc', 'chevron', 'circles', 'squares', 'gradient_strip', 
-        'zigzag', 'waves', 'dots', 'tiles', '3d_cube'
-    ])
-
-if st.button("Generate Palette"):
-    with st.spinner("Generating palette..."):
-        try:
-            palette = cached_generate_palette(base_hex, style, num_colors, hue_shift, saturation_boost)
-            if not palette or len(palette) < num_colors:
-                palette += random.sample([c['hex'] for c in COLORS], num_colors - len(palette))
-                st.warning("Palette padded with random colors due to generation constraints.")
-            st.session_state.palette = palette
-            st.session_state.display_style = display_style
-        except Exception as e:
-            st.error(f"Error generating palette: {str(e)}")
-            st.session_state.palette = None
-
-# Display generated palette
-if st.session_state.palette:
-    with col2:
-        st.header(f"{style.replace('_', ' ').upper()} Palette")
-        display_style = st.session_state.display_style
+        style = st.selectbox("Style", style_names(), key="style")
+        large = st.toggle("Large palette mode", help="256-4096 colors, drawn on a canvas")
+        if large:
+            num_colors = st.select_slider("Number of Colors", LARGE_SIZES, 1024)
+        else:
+            num_colors = st.slider("Number of Colors", 3, 20, key="num_colors")
+        hue_shift = st.slider("Hue Shift Range", 0.0, 1.0, step=0.05, key="hue_shift", help="Controls hue variation")
+        saturation_boost = st.slider("Saturation Boost", 0.0, 1.0, step=0.05, key="saturation_boost", help="Adjusts color intensity")
+        space = st.selectbox("Color Space", GENERATION_SPACES, key="space", help="Working space for the style's hue, lightness and saturation rules")
+        display_style = st.selectbox("Display Style", CANVAS_MODES if large else DISPLAY_STYLES)
+        # Randomized styles can draw many candidates and keep the best-scoring one
+        best_of = 1
+        if not is_cacheable(style) and not large:
+            best_of = st.select_slider("Best of N", [1, 16, 64, 256, 1024], 1, help="Score N random draws and keep the best")
+
+    if large:
+        _large_workspace(col2, base_hex, style, num_colors, hue_shift, saturation_boost, space, display_style)
+        return
+
+    if st.button("Generate Palette"):
+        with st.spinner("Generating palette..."):
+            try:
+                # Randomized draws get a seed so the share token records how to reproduce them
+                seed = None if is_cacheable(style) else secrets.randbits(32)
+                palette = get_palette(base_hex, style, num_colors, hue_shift, saturation_boost, best_of, space, seed)
+                if not palette or len(palette) < num_colors:
+                    palette += random.sample([c['hex'] for c in COLORS], num_colors - len(palette))
+                    st.warning("Palette padded with random colors due to generation constraints.")
+                set_palette(palette)
+                publish_palette(palette, style, base_hex, num_colors, hue_shift, saturation_boost, space, seed)
+                st.session_state.display_style = display_style
+                index = st.session_state.palette_index
+                index.add(f"Generated {index.added + 1} ({style})", palette)
+            except Exception as e:
+                st.error(f"Error generating palette: {str(e)}")
+                set_palette(None)
+                _republish()
+
+    # Display generated palette
+    if st.session_state.palette:
+        with col2:
+            st.header(f"{style.replace('_', ' ').upper()} Palette")
+            display_style = st.session_state.display_style
         
-        try:
-            # Matplotlib-based styles
-            if display_style in ['rainbow_arc', 'hexagon_grid', 'spiral_swirl', 'color_wheel']:
-                if display_style == 'rainbow_arc':
-                    fig = render_rainbow_arc(st.session_state.palette)
-                elif display_style == 'hexagon_grid':
-                    fig = render_hexagon_grid(st.session_state.palette)
-                elif display_style == 'spiral_swirl':
-                    fig = render_spiral_swirl(st.session_state.palette)
-                elif display_style == 'color_wheel':
-                    fig = render_color_wheel(st.session_state.palette)
-                st.pyplot(fig)
-                plt.close(fig)
-            
-            # HTML/CSS-based styles
-            elif display_style == 'rectangle_bars':
-                cols = st.columns(len(st.session_state.palette))
-                for i, color in enumerate(st.session_state.palette):
-                    with cols[i]:
-                        name = next((c['name'] for c in all_colors if c['hex'].upper() == color.upper()), "Generated")
-                        st.markdown(
-                            f"<div class='palette-box' style='background:{color}; height:150px; text-align:center; color:white; padding:10px;'><b>{name}</b><br>{color}<br><button class='copy-hex' onclick='copyToClipboard(\"{color}\")'>Copy</button></div>",
-                            unsafe_allow_html=True
-                        )
+            try:
+                with profiler.timer(f'render.{display_style}'):
+                    palette = st.session_state.palette
+                    # Matplotlib-based styles
+                    if display_style in MPL_RENDERERS:
+                        st.image(preview_png(display_style, palette))
             
-            elif display_style == 'tiles':
-                html = "<div style='display:grid; grid-template-columns: repeat(auto-fill, minmax(80px, 1fr)); gap:5px;'>"
-                for color in st.session_state.palette:
-                    name = next((c['name'] for c in all_colors if c['hex'].upper() == color.upper()), "Gen")
-                    html += f"<div class='palette-box' style='background:{color}; width:80px; height:80px; color:white; padding:5px; font-size:10px;'><b>{name}</b><br>{color}</div>"
-                html += "</div>"
-                st.markdown(html, unsafe_allow_html=True)
+                    # HTML/CSS-based styles, one column per color
+                    elif display_style in CELL_RENDERERS:
+                        cols = st.columns(len(palette))
+                        for i, cell in enumerate(swatch_cells(palette, display_style)):
+                            with cols[i]:
+                                render_html(cell, display_style)
             
-            elif display_style == 'squares':
-                cols = st.columns(len(st.session_state.palette))
-                for i, color in enumerate(st.session_state.palette):
-                    with cols[i]:
-                        name = next((c['name'] for c in all_colors if c['hex'].upper() == color.upper()), "Generated")
-                        st.markdown(
-                            f"<div class='palette-box' style='background:{color}; width:100px; height:100px; text-align:center; color:white; padding:10px; font-size:10px;'><b>{name}</b><br>{color}</div>",
-                            unsafe_allow_html=True
-                        )
+                    # HTML/CSS-based styles, one block per palette
+                    elif display_style in HTML_RENDERERS:
+                        render_html(HTML_RENDERERS[display_style](palette, color_name), display_style)
             
-            elif display_style == 'circles':
-                cols = st.columns(len(st.session_state.palette))
-                for i, color in enumerate(st.session_state.palette):
-                    with cols[i]:
-                        name = next((c['name'] for c in all_colors if c['hex'].upper() == color.upper()), "Gen")
-                        st.markdown(
-                            f"<div class='palette-box' style='background:{color}; width:100px; height:100px; border-radius:50%; text-align:center; color:white; padding:30px 5px; font-size:9px;'><b>{name}</b><br>{color}</div>",
-                            unsafe_allow_html=True
-                        )
-            
-            elif display_style == 'chevron':
-                html = "<div style='display:flex; height:200px;'>"
-                for i, color in enumerate(st.session_state.palette):
-                    offset = (i % 2) * 20
-                    html += f"<div style='background:{color}; flex:1; clip-path:polygon(0 {offset}px, 100% {offset+20}px, 100% calc(100% - {offset}px), 0 calc(100% - {offset+20}px)); margin:0 -5px;'></div>"
-                html += "</div>"
-                st.markdown(html, unsafe_allow_html=True)
-            
-            elif display_style == 'gradient_strip':
-                gradient = ", ".join(st.session_state.palette)
-                html = f"<div style='height:150px; background: linear-gradient(to right, {gradient}); border-radius:10px;'></div>"
-                st.markdown(html, unsafe_allow_html=True)
-            
-            elif display_style == 'zigzag':
-                html = "<div style='display:flex; height:200px;'>"
-                for i, color in enumerate(st.session_state.palette):
-                    points = "0 50%, 50% 0, 100% 50%, 50% 100%" if i % 2 == 0 else "0 0, 100% 0, 100% 100%, 0 100%"
-                    html += f"<div style='background:{color}; flex:1; clip-path:polygon({points});'></div>"
-                html += "</div>"
-                st.markdown(html, unsafe_allow_html=True)
-            
-            elif display_style == 'waves':
-                html = "<div style='position:relative; height:200px; overflow:hidden;'>"
-                for i, color in enumerate(st.session_state.palette):
-                    offset = i * 30
-                    html += f"<div style='position:absolute; width:100%; height:50px; background:{color}; top:{offset}px; border-radius:50%;'></div>"
-                html += "</div>"
-                st.markdown(html, unsafe_allow_html=True)
+                # Warm the cache for the states one slider step away
+                if is_cacheable(style):
+                    prefetch_neighbors(base_hex, style, num_colors, hue_shift, saturation_boost, space, display_style)
+
+                # Lock swatches, then reroll only the unlocked ones
+                lock_cols = st.columns(len(palette))
+                for i in range(len(palette)):
+                    with lock_cols[i]:
+                        st.checkbox("🔒", key=f"lock_{i}")
+                locked = [i for i in range(len(palette)) if st.session_state.get(f"lock_{i}")]
+                # on_click runs before the fragment reruns, so no explicit st.rerun is needed
+                st.button("Reroll Unlocked", disabled=len(locked) == len(palette), on_click=_reroll,
+                          args=(palette, locked, base_hex, style, hue_shift, saturation_boost, space))
+                history = st.session_state.palette_history
+                undo_col, redo_col = st.columns(2)
+                undo_col.button("Undo", disabled=not history.undo_stack, on_click=_undo)
+                redo_col.button("Redo", disabled=not history.redo_stack, on_click=_redo)
             
-            elif display_style == 'dots':
-                html = "<div style='display:flex; flex-wrap:wrap; gap:10px; justify-content:center; padding:20px;'>"
-                for color in st.session_state.palette:
-                    html += f"<div style='background:{color}; width:60px; height:60px; border-radius:50%;'></div>"
-                html += "</div>"
-                st.markdown(html, unsafe_allow_html=True)
+                # Save palette
+                if st.button("Save Palette"):
+                    st.session_state.saved_palettes.append(st.session_state.palette)
+                    st.session_state.palette_index.add(f"Saved {len(st.session_state.saved_palettes)}", st.session_state.palette)
+                    # The saved palettes section lives outside this fragment
+                    st.rerun(scope="app")
             
-            elif display_style == '3d_cube':
-                html = "<div style='display:grid; grid-template-columns:repeat(3, 1fr); gap:5px; perspective:400px;'>"
-                for i, color in enumerate(st.session_state.palette):
-                    rotation = f"rotateY({i*15}deg)"
-                    html += f"<div style='background:{color}; height:80px; transform:{rotation}; box-shadow:0 4px 8px rgba(0,0,0,0.3);'></div>"
-                html += "</div>"
-                st.markdown(html, unsafe_allow_html=True)
+                # Download palette
+                palette_data = [{"name": color_name(color), "hex": color} for color in st.session_state.palette]
+                st.download_button("Download JSON", json.dumps(palette_data, indent=2), "palette.json")
+                if st.session_state.palette_token:
+                    with st.expander("Share"):
+                        st.caption(f"Palette ID {palette_id(st.session_state.palette)}")
+                        st.code(f"?p={st.session_state.palette_token}", language=None)
             
-            # Save palette
-            if st.button("Save Palette"):
-                st.session_state.saved_palettes.append(st.session_state.palette)
-                st.success("Palette saved!")
+                # Similar palettes among everything generated or saved this session
+                with st.expander("Find similar palettes"):
+                    with profiler.timer('similarity.query'):
+                        matches = st.session_state.palette_index.query(palette, k=6)
+                    matches = [m for m in matches if m[1] != palette][:5]
+                    if not matches:
+                        st.write("Generate or save more palettes to compare against.")
+                    for key, match, score in matches:
+                        swatches = "".join(f"<div style='background:{c}; flex:1; height:30px;'></div>" for c in match)
+                        st.markdown(f"**{key}** · {score:.0%} similar<div style='display:flex;'>{swatches}</div>", unsafe_allow_html=True)
             
-            # Download palette
-            palette_data = [{"name": next((c['name'] for c in all_colors if c['hex'].upper() == color.upper()), "Generated"), "hex": color} for color in st.session_state.palette]
-            st.download_button("Download JSON", json.dumps(palette_data, indent=2), "palette.json")
+                # Colormap export
+                with st.expander("Export as colormap"):
+                    ramp_size = st.selectbox("Ramp entries", RAMP_SIZES)
+                    ramp_space = st.selectbox("Interpolation space", SPACES)
+                    with profiler.timer('colormap.ramp'):
+                        lut = ramp(palette, ramp_size, ramp_space)
+                    st.download_button("Download .cpt", to_cpt(lut), "palette.cpt")
+                    st.download_button("Download CSS gradient", to_css_stops(lut), "palette.css")
+                    st.download_button("Download raw LUT", to_lut_bytes(lut), f"palette_{ramp_size}.rgb")
+
+                with st.expander("Design tokens"):
+                    names = [f"{i + 1}" for i in range(len(palette))]
+                    with profiler.timer('tokens.palette'):
+                        scales = build_scales(hex_to_rgb_array(palette))
+                    st.download_button("Download tokens CSS", tokens_css(names, scales, prefix='palette'), "tokens.css")
+                    st.download_button("Download tokens JSON", tokens_json(names, scales, contrast(scales)), "tokens.json")
+
+                # One slider swept from start to stop, encoded on click
+                with st.expander("Sweep animation"):
+                    param = st.selectbox("Sweep", SWEEP_PARAMS)
+                    start, stop = st.slider("Range", 0.0, 1.0, (0.0, 1.0), 0.05)
+                    frames = st.slider("Frames", 10, 300, 100, 10)
+                    fmt = st.selectbox("Format", [f for f in SWEEP_FORMATS if f != 'rgb'])
+                    def build_sweep(args=(base_hex, style, len(palette), param, start, stop, frames, hue_shift, saturation_boost, space), fmt=fmt):
+                        with profiler.timer(f'sweep.{fmt}'):
+                            return b''.join(SWEEP_FORMATS[fmt](sweep_palettes(*args)))
+                    st.download_button("Download animation", build_sweep, f"sweep.{SWEEP_EXTENSIONS[fmt]}")
         
-        except Exception as e:
-            st.error(f"Error displaying palette: {str(e)}")
-            st.write("Raw Palette:", st.session_state.palette)
+            except Exception as e:
+                st.error(f"Error displaying palette: {str(e)}")
+                st.write("Raw Palette:", st.session_state.palette)
+
+palette_workspace()
 
 # DISPLAY SAVED PALETTES
-if st.session_state.saved_palettes:
-    st.header("Saved Palettes")
-    for i, saved_palette in enumerate(st.session_state.saved_palettes):
-        st.markdown(f"**Palette {i+1}**")
-        cols = st.columns(len(saved_palette))
-        for j, color in enumerate(saved_palette):
-            with cols[j]:
-                st.markdown(f"<div style='background:{color}; height:50px; border-radius:5px;'></div>", unsafe_allow_html=True)
+@st.fragment
+def saved_palettes_section():
+    if st.session_state.saved_palettes:
+        st.header("Saved Palettes")
+        with profiler.timer('rerun.saved_palettes'):
+            for i, saved_palette in enumerate(st.session_state.saved_palettes):
+                st.markdown(f"**Palette {i+1}**")
+                cols = st.columns(len(saved_palette))
+                for j, color in enumerate(saved_palette):
+                    with cols[j]:
+                        st.markdown(f"<div style='background:{color}; height:50px; border-radius:5px;'></div>", unsafe_allow_html=True)
+
+        # Built only when clicked, on Streamlit's download thread
+        # Spilled palettes are read back from disk only when someone downloads
+        def build_bundle(store=st.session_state.saved_palettes, count=len(st.session_state.saved_palettes), name_of=library.name_of):
+            with profiler.timer('export.bundle'):
+                return write_zip(io.BytesIO(), [store[i] for i in range(count)], name_of=name_of).getvalue()
+        st.download_button("Download all (ASE, GPL, SVG, CSS, Tailwind)", build_bundle, "palettes.zip", mime="application/zip")
+
+saved_palettes_section()
 
 # COLOR LIBRARY TOGGLE
-if st.button("Toggle Color Library"):
-    st.session_state.show_library = not st.session_state.show_library
-
-if st.session_state.show_library:
-    with st.expander("Color Library", expanded=True):
-        st.markdown("**Color Library**")
-        html = "<div class='library-grid'>"
-        for color in all_colors:
-            html += f"<div class='palette-box' style='background:{color['hex']}; padding:10px; color:white; font-size:11px;'><b>{color['name']}</b><br>{color['hex']}<br>Vibe: {color['vibe']}</div>"
-        html += "</div>"
-        st.markdown(html, unsafe_allow_html=True)
+@st.fragment
+def library_section():
+    if st.button("Toggle Color Library"):
+        st.session_state.show_library = not st.session_state.show_library
+
+    if st.session_state.show_library:
+        with st.expander("Color Library", expanded=True):
+            st.markdown("**Color Library**")
+            with profiler.timer('rerun.library'):
+                render_html(library_html(), 'library')
+
+            # Built only when clicked
+            def build_tokens(colors=list(all_colors)):
+                table, lock = get_token_scales()
+                with lock, profiler.timer('tokens.library'):
+                    profiler.count('tokens.recomputed', table.refresh(colors))
+                    return tokens_json(table.names, table.scales, table.contrast)
+            st.download_button("Download design tokens (50-900)", build_tokens, "tokens.json", mime="application/json")
+
+library_section()
+
+# DEBUG METRICS
+profiler.record_time('rerun.total', time.perf_counter() - _rerun_start)
+with st.sidebar:
+    if st.checkbox("Show debug metrics"):
+        for kind in ('saved_palettes', 'custom_colors', 'palette_history'):
+            _report_session_usage(kind, usage_totals(kind))
+        snap = profiler.snapshot()
+        requests = snap['counters'].get('palette.requests', 0)
+        misses = snap['counters'].get('palette.cache_misses', 0)
+        if requests:
+            st.metric("Palette cache hit rate", f"{(requests - min(misses, requests)) / requests:.0%}")
+        prefetch = get_prefetcher().stats()
+        if prefetch['computed']:
+            st.metric("Prefetch hit rate", f"{prefetch['hit_rate']:.0%}", help=f"{prefetch['wasted']} wasted, {prefetch['cancelled']} cancelled")
+        st.dataframe(
+            [{'name': name, **{k: round(v * 1000, 3) if k.endswith('_s') else v for k, v in t.items()}}
+             for name, t in sorted(snap['timers'].items())]
+        )
+        st.json(snap['counters'])
+        st.json({kind: st.session_state[kind].usage() for kind in ('saved_palettes', 'custom_colors', 'palette_history')})
+        st.download_button("Metrics JSON", profiler.to_json(indent=2), "metrics.json")
+        st.download_button("Metrics (Prometheus)", profiler.to_prometheus(), "metrics.prom")
+        if st.button("Reset metrics"):
+            profiler.reset()
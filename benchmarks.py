@@ -0,0 +1,378 @@
+# benchmarks.py - Microbenchmarks for palette styles, renderers, lookups and exports
+#
+# Usage:
+#   python benchmarks.py                          # run everything, write bench_results.json
+#   python benchmarks.py --save-baseline          # also store the results as the baseline
+#   python benchmarks.py --baseline bench_baseline.json --threshold 0.25
+#   python benchmarks.py --filter style.          # only cases whose name contains "style."
+#   python benchmarks.py --stress 2000 --threads 8  # concurrent render stress test
+#   python benchmarks.py --stress 2000 --min-rate 300
+#
+# Cases are timed with gc disabled, as timeit does, and compared relative to
+# a fixed reference loop timed alongside every repeat, so a host that slows
+# down for a while (frequency scaling, a busy neighbor) doesn't show up as a
+# regression. The suite runs in several fresh processes (--processes) and
+# each case keeps its median across them, since one process can land in a
+# faster or slower memory layout than the next.
+#
+# Exits with status 1 when any case is slower than baseline * (1 + threshold),
+# is missing from the baseline, or there is no baseline to compare against
+# (pass --save-baseline to create one), or in stress mode when any concurrent
+# render differs from its serial reference or throughput falls below
+# --min-rate (default: the baseline's stress rate less the threshold).
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from colors import COLORS
+from utils import generate_palette, generate_packed, is_cacheable, style_names
+from render import MPL_RENDERERS, CELL_RENDERERS, HTML_RENDERERS, render_png, render_rgba, canvas_html
+from colormap import RAMP_SIZES, SPACES, build_ramp, ramp, to_cpt
+from library import ColorLibrary
+from export import write_zip
+from scoring import best_of_n
+from materialize import MaterializedTable
+from palette_id import palette_id, encode_state, decode_state
+from sweep import sweep_palettes, write_gif, write_apng
+from harmony_fit import HueIndex, assignment, fit_palette
+from session_store import PaletteStore, PaletteHistory
+from tokens import TokenScales, build_scales, contrast, to_json as tokens_json
+from colorspace import hex_to_rgb_array
+
+NUM_COLORS = [3, 5, 10, 20]
+BASE_HEX = '#45B1E8'
+SEED = 1234
+
+LIBRARY = ColorLibrary(COLORS)
+
+def _name_of(hex_str, default="Generated"):
+    return LIBRARY.name_of(hex_str, default)
+
+def _sample_palette(num):
+    rng = random.Random(SEED)
+    return [c['hex'] for c in rng.sample(COLORS, num)]
+
+def build_cases():
+    """
+    Return a list of (name, callable) pairs. Randomized styles draw from
+    their own random.Random(SEED) on every call, so timings don't depend on
+    which colors were drawn and the global random module is left alone.
+    """
+    cases = []
+    for style in style_names():
+        seed = None if is_cacheable(style) else SEED
+        for num in NUM_COLORS:
+            cases.append((f'style.{style}.n{num}', lambda s=style, n=num, seed=seed: generate_palette(BASE_HEX, s, n, 0.1, 0.5, seed=seed)))
+        cases.append((f'style_oklch.{style}.n10', lambda s=style, seed=seed: generate_palette(BASE_HEX, s, 10, 0.1, 0.5, space='oklch', seed=seed)))
+
+    for num in (5, 20):
+        palette = _sample_palette(num)
+        for name in MPL_RENDERERS:
+            cases.append((f'render.{name}.n{num}', lambda s=name, p=palette: render_png(s, p)))
+        for name, cell in CELL_RENDERERS.items():
+            cases.append((f'render.{name}.n{num}', lambda c=cell, p=palette: [c(color, _name_of) for color in p]))
+        for name, builder in HTML_RENDERERS.items():
+            cases.append((f'render.{name}.n{num}', lambda b=builder, p=palette: b(p, _name_of)))
+
+    for style in ('warm', 'golden_ratio', 'wes_anderson'):
+        cases.append((f'best_of.{style}.n256', lambda s=style: best_of_n(BASE_HEX, s, 5, 0.1, 0.5, n=256, budget_s=1.0, seed=SEED)))
+
+    for style in ('golden_ratio', 'triadic', 'random'):
+        cases.append((f'large.generate.{style}.n4096', lambda s=style: generate_packed(BASE_HEX, s, 4096, 0.1, 0.5, rng=np.random.default_rng(SEED))))
+    packed = generate_packed(BASE_HEX, 'triadic', 4096)
+    cases.append(('large.canvas_html.n4096', lambda: canvas_html(packed, 'wheel')))
+
+    # Only when materialize.py has been run
+    table = MaterializedTable()
+    if 'triadic' in table.tables:
+        cases.append(('materialize.lookup.triadic.n12', lambda: table.lookup('triadic', BASE_HEX, 12, 0.15, 0.5)))
+
+    palette = _sample_palette(20)
+    token = encode_state(palette, 'golden_ratio', BASE_HEX, 20, 0.1, 0.5, seed=SEED)
+    cases.append(('palette_id.n20', lambda: palette_id(palette)))
+    cases.append(('palette_id.encode.n20', lambda: encode_state(palette, 'golden_ratio', BASE_HEX, 20, 0.1, 0.5, seed=SEED)))
+    cases.append(('palette_id.decode.n20', lambda: decode_state(token)))
+    sweep = sweep_palettes(BASE_HEX, 'triadic', 7, frames=100)
+    cases.append(('sweep.palettes.triadic.f100', lambda: sweep_palettes(BASE_HEX, 'triadic', 7, frames=100)))
+    cases.append(('sweep.gif.f100', lambda: b''.join(write_gif(sweep))))
+    cases.append(('sweep.apng.f100', lambda: b''.join(write_apng(sweep))))
+
+    def fill_store(count=1000):
+        store = PaletteStore(max_bytes=16 * 1024)
+        for _ in range(count):
+            store.append(palette)
+        return store
+    store = fill_store()
+    rerolled = palette[:10] + _sample_palette(10)
+    cases.append(('session.store.append_spill.n1000', fill_store))
+    cases.append(('session.store.iter.n1000', lambda: sum(1 for _ in store)))
+    cases.append(('session.history.record.n20', lambda: PaletteHistory().record(palette, rerolled)))
+
+    hue_index = HueIndex()
+    target = generate_palette(BASE_HEX, 'split_complementary', 5, 0.15, 0.5)[::-1]
+    cost = np.random.default_rng(SEED).random((20, 20))
+    cases.append(('harmony_fit.assignment.n20', lambda: assignment(cost)))
+    cases.append(('harmony_fit.fit.n5', lambda: fit_palette(target, 3, budget_s=1.0, index=hue_index)))
+
+    library_rgb = hex_to_rgb_array([c['hex'] for c in COLORS])
+    scales = build_scales(library_rgb)
+    warm = TokenScales()
+    warm.refresh(COLORS)
+    cases.append((f'tokens.build.n{len(COLORS)}', lambda: build_scales(library_rgb)))
+    cases.append((f'tokens.refresh_unchanged.n{len(COLORS)}', lambda: warm.refresh(COLORS)))
+    cases.append((f'tokens.json.n{len(COLORS)}', lambda: tokens_json([c['name'] for c in COLORS], scales, contrast(scales))))
+    cases.append(('library.name_lookup.n20', lambda: [_name_of(c) for c in palette]))
+    cases.append(('library.base_options', lambda: {c['name']: c['hex'] for c in COLORS}))
+    cases.append(('library.html', lambda: "".join(
+        f"<div class='palette-box' style='background:{c['hex']};'><b>{c['name']}</b><br>{c['hex']}<br>Vibe: {c['vibe']}</div>"
+        for c in COLORS)))
+    cases.append(('export.json.n20', lambda: json.dumps(
+        [{"name": _name_of(c), "hex": c} for c in palette], indent=2)))
+    for space in SPACES:
+        for size in RAMP_SIZES:
+            cases.append((f'colormap.build.{space}.{size}', lambda s=space, n=size: build_ramp(palette, n, s)))
+    cases.append(('colormap.cached.4096', lambda: ramp(palette, 4096)))
+    cases.append(('export.cpt.256', lambda: to_cpt(ramp(palette, 256))))
+    saved = [_sample_palette(num) for num in NUM_COLORS * 5]
+    cases.append(('export.zip.20_palettes', lambda: write_zip(io.BytesIO(), saved, name_of=_name_of)))
+    return cases
+
+def _reference():
+    # Fixed pure-Python workload that tracks how fast the host is running right now
+    return sum(i * i for i in range(1000))
+
+def _calibrate(func, min_time):
+    # Loop count that makes one timed batch last at least min_time
+    loops = 1
+    while True:
+        elapsed = _time_batch(func, loops)
+        if elapsed >= min_time or loops >= 1 << 20:
+            return loops
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+def _time_batch(func, loops):
+    start = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return time.perf_counter() - start
+
+def time_case(func, repeat=7, min_time=0.02):
+    """
+    Best, median and worst seconds per call over repeat batches, timed with
+    gc disabled as timeit does. Each batch is paired with a batch of the
+    reference loop run right before it; 'relative' is the median ratio of
+    the two, which cancels out the host speeding up or slowing down between
+    batches.
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        loops = _calibrate(func, min_time)
+        ref_loops = _calibrate(_reference, min_time / 4)
+        samples, ratios = [], []
+        for _ in range(repeat):
+            ref = _time_batch(_reference, ref_loops) / ref_loops
+            samples.append(_time_batch(func, loops) / loops)
+            ratios.append(samples[-1] / ref)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        'loops': loops,
+        'min_s': min(samples),
+        'median_s': statistics.median(samples),
+        'max_s': max(samples),
+        'relative': statistics.median(ratios),
+    }
+
+def run(name_filter=None, repeat=7, min_time=0.02, out=sys.stdout):
+    results = {}
+    for name, func in build_cases():
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = time_case(func, repeat, min_time)
+        print(f"{name:<40} {results[name]['min_s'] * 1e6:12.1f} us", file=out)
+    return {'meta': machine_meta(), 'results': results}
+
+def run_processes(processes, name_filter=None, repeat=7, min_time=0.02, out=sys.stdout):
+    # run() in fresh interpreters, keeping each case's median across them
+    if processes <= 1:
+        return run(name_filter, repeat, min_time, out)
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(processes):
+            path = os.path.join(tmp, f'run{i}.json')
+            cmd = [sys.executable, os.path.abspath(__file__), '--worker', '--output', path,
+                   '--repeat', str(repeat), '--min-time', str(min_time)]
+            if name_filter:
+                cmd += ['--filter', name_filter]
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+            runs.append(_load_json(path)['results'])
+            print(f"process {i + 1}/{processes} done", file=out)
+    results = {}
+    for name in runs[0]:
+        entries = [r[name] for r in runs if name in r]
+        results[name] = {key: statistics.median(e[key] for e in entries)
+                         for key in ('loops', 'min_s', 'median_s', 'max_s', 'relative')}
+        print(f"{name:<40} {results[name]['min_s'] * 1e6:12.1f} us", file=out)
+    return {'meta': machine_meta(), 'results': results}
+
+def machine_meta():
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def compare(current, baseline, threshold=0.25, noise_floor=5e-6):
+    """
+    Compare timings against a baseline, relative to the reference loop
+    when both sides recorded it and best-of-repeat otherwise. Returns
+    (regressions, missing): (name, baseline_s, current_s, ratio) for cases
+    slower than baseline * (1 + threshold), and the names of cases the
+    baseline has no entry for. Differences under noise_floor seconds are ignored.
+    """
+    regressions = []
+    missing = []
+    for name, cur in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            missing.append(name)
+            continue
+        b, c = base['min_s'], cur['min_s']
+        if base.get('relative') and cur.get('relative'):
+            # Current time as it would have run at the baseline's host speed
+            c = b * cur['relative'] / base['relative']
+        if c - b <= noise_floor:
+            continue
+        ratio = c / b if b else float('inf')
+        if ratio > 1 + threshold:
+            regressions.append((name, b, c, ratio))
+    return regressions, missing
+
+def stress(total=2000, threads=8, dpi=50, out=sys.stdout):
+    """
+    Render total previews from a thread pool, cycling through every
+    Matplotlib style and a few palettes, and compare each image pixel for
+    pixel against a reference rendered serially up front. Returns
+    (mismatches, renders_per_second).
+    """
+    palettes = [_sample_palette(num) for num in NUM_COLORS]
+    jobs = [(style, i) for style in MPL_RENDERERS for i in range(len(palettes))]
+    reference = {job: render_rgba(job[0], palettes[job[1]], dpi) for job in jobs}
+    work = [jobs[k % len(jobs)] for k in range(total)]
+
+    def render(job):
+        return job, render_rgba(job[0], palettes[job[1]], dpi)
+
+    start = time.perf_counter()
+    mismatches = 0
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for job, pixels in pool.map(render, work):
+            if not np.array_equal(pixels, reference[job]):
+                mismatches += 1
+                print(f"MISMATCH {job[0]} palette {job[1]}", file=out)
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed
+    print(f"{total} renders on {threads} threads in {elapsed:.2f} s ({rate:.0f}/s), {mismatches} mismatches", file=out)
+    return mismatches, rate
+
+def _load_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run palette microbenchmarks')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', default='bench_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown ratio, 0.25 = 25%%')
+    parser.add_argument('--filter', default=None)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--min-time', type=float, default=0.02)
+    parser.add_argument('--processes', type=int, default=3, help='fresh interpreters to run the suite in')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--stress', type=int, default=0, metavar='N', help='run N concurrent renders instead of the benchmarks')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--min-rate', type=float, default=None, help='stress mode: fail below this many renders/s '
+                        '(default: the baseline rate for the same thread count, less --threshold)')
+    args = parser.parse_args(argv)
+
+    if args.stress:
+        mismatches, rate = stress(args.stress, args.threads)
+        key = f'stress.threads{args.threads}'
+        if args.save_baseline:
+            baseline = _load_json(args.baseline) or {'meta': machine_meta(), 'results': {}}
+            baseline.setdefault('stress', {})[key] = rate
+            with open(args.baseline, 'w') as f:
+                json.dump(baseline, f, indent=2, sort_keys=True)
+            print(f"Stress rate written to {args.baseline}")
+        # An explicit --min-rate wins; otherwise the baseline rate less the threshold
+        min_rate = args.min_rate
+        if min_rate is None:
+            base = (_load_json(args.baseline) or {}).get('stress', {}).get(key)
+            min_rate = base / (1 + args.threshold) if base else 0.0
+        if rate < min_rate:
+            print(f"THROUGHPUT {rate:.0f}/s is below the minimum of {min_rate:.0f}/s")
+        return 1 if mismatches or rate < min_rate else 0
+
+    if args.worker:
+        with open(args.output, 'w') as f:
+            json.dump(run(args.filter, args.repeat, args.min_time), f)
+        return 0
+
+    current = run_processes(args.processes, args.filter, args.repeat, args.min_time)
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        # Keep any stress rates recorded by --stress --save-baseline
+        stress_rates = (_load_json(args.baseline) or {}).get('stress')
+        if stress_rates:
+            current['stress'] = stress_rates
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    baseline = _load_json(args.baseline)
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one", file=sys.stderr)
+        return 1
+    if baseline['meta'].get('machine') != current['meta']['machine'] or baseline['meta'].get('cpu_count') != current['meta']['cpu_count']:
+        print(f"Warning: baseline was recorded on {baseline['meta'].get('platform')} "
+              f"({baseline['meta'].get('cpu_count')} CPUs); timings may not be comparable", file=sys.stderr)
+
+    regressions, missing = compare(current, baseline, args.threshold)
+    for name, b, c, ratio in regressions:
+        print(f"REGRESSION {name}: {b * 1e6:.1f} us -> {c * 1e6:.1f} us ({ratio:.2f}x)")
+    for name in missing:
+        print(f"MISSING {name}: not in {args.baseline}; re-record it with --save-baseline")
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed beyond {args.threshold:.0%}")
+    if missing:
+        print(f"{len(missing)} case(s) missing from the baseline")
+    if regressions or missing:
+        return 1
+    print("No regressions")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# clustering.py - Offline library clustering, near-duplicate detection and bucket metadata
+#
+# Usage:
+#   python clustering.py                 # analyze colors.COLORS, write color_meta.json
+#   python clustering.py --report        # also print the near-duplicate pairs
+#
+# utils.py reads color_meta.json to sample colors from balanced hue/lightness
+# buckets; rerun this after editing colors.py (a stale file is ignored).
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from colors import COLORS
+from colorspace import hex_to_rgb_array, rgb_to_cielab, rgb_to_oklab, oklab_to_oklch
+from utils import META_PATH, library_digest
+
+DUPLICATE_DE = 2.3    # CIE76 just-noticeable difference
+CLUSTER_DE = 10.0     # single-linkage cut height for color families
+HUE_BUCKETS = 12
+LIGHTNESS_BUCKETS = 3
+NEUTRAL_CHROMA = 0.04  # OKLCh chroma below which hue is meaningless
+BLOCK = 1024
+
+def near_duplicates(lab, threshold=DUPLICATE_DE, block=BLOCK):
+    """
+    All pairs (i, j, ΔE) with i < j and ΔE76 below threshold. Distances are
+    computed block x block, so memory stays O(block^2) whatever the library size.
+    """
+    n = len(lab)
+    pairs = []
+    for i0 in range(0, n, block):
+        a = lab[i0:i0 + block]
+        for j0 in range(i0, n, block):
+            b = lab[j0:j0 + block]
+            d = np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=-1))
+            ii, jj = np.nonzero(d < threshold)
+            keep = (ii + i0) < (jj + j0)
+            for i, j in zip(ii[keep].tolist(), jj[keep].tolist()):
+                pairs.append((i + i0, j + j0, float(d[i, j])))
+    return pairs
+
+def single_linkage(lab):
+    """
+    Single-linkage hierarchy as the minimum spanning tree (Prim's algorithm),
+    one distance row at a time so memory is O(n). Returns MST edges
+    (i, j, ΔE) sorted by distance; merging them in order is the dendrogram.
+    """
+    n = len(lab)
+    if n < 2:
+        return []
+    in_tree = np.zeros(n, dtype=bool)
+    best = np.full(n, np.inf)
+    parent = np.full(n, -1)
+    current = 0
+    edges = []
+    for _ in range(n - 1):
+        in_tree[current] = True
+        d = np.sqrt(((lab - lab[current]) ** 2).sum(axis=1))
+        closer = (d < best) & ~in_tree
+        best[closer] = d[closer]
+        parent[closer] = current
+        masked = np.where(in_tree, np.inf, best)
+        current = int(np.argmin(masked))
+        edges.append((int(parent[current]), current, float(best[current])))
+    edges.sort(key=lambda e: e[2])
+    return edges
+
+def cut_clusters(n, edges, height=CLUSTER_DE):
+    # Union-find over the dendrogram edges below the cut height
+    root = list(range(n))
+    def find(x):
+        while root[x] != x:
+            root[x] = root[root[x]]
+            x = root[x]
+        return x
+    for i, j, d in edges:
+        if d > height:
+            break
+        root[find(i)] = find(j)
+    labels = {}
+    return [labels.setdefault(find(i), len(labels)) for i in range(n)]
+
+def bucket_labels(rgb):
+    # Hue sector x lightness band in OKLCh; low-chroma colors share one neutral sector
+    lch = oklab_to_oklch(rgb_to_oklab(rgb / 255.0))
+    band = np.minimum((lch[:, 0] * LIGHTNESS_BUCKETS).astype(int), LIGHTNESS_BUCKETS - 1)
+    sector = (lch[:, 2] / (360.0 / HUE_BUCKETS)).astype(int) % HUE_BUCKETS
+    return [
+        f"neutral-l{b}" if c < NEUTRAL_CHROMA else f"h{s:02d}-l{b}"
+        for s, b, c in zip(sector.tolist(), band.tolist(), lch[:, 1].tolist())
+    ]
+
+def build_metadata(colors):
+    hexes = [c['hex'] for c in colors]
+    rgb = hex_to_rgb_array(hexes).astype(np.float64)
+    lab = rgb_to_cielab(rgb / 255.0)
+    pairs = near_duplicates(lab)
+    edges = single_linkage(lab)
+    clusters = cut_clusters(len(colors), edges)
+    buckets = bucket_labels(rgb)
+    # Later entries point at the first color they duplicate
+    duplicate_of = [None] * len(colors)
+    for i, j, _ in sorted(pairs):
+        keeper = i if duplicate_of[i] is None else duplicate_of[i]
+        if duplicate_of[j] is None and keeper != j:
+            duplicate_of[j] = keeper
+    members = {}
+    for i, b in enumerate(buckets):
+        if duplicate_of[i] is None:
+            members.setdefault(b, []).append(i)
+    return {
+        'library_digest': library_digest(hexes),
+        'count': len(colors),
+        'duplicate_de': DUPLICATE_DE,
+        'cluster_de': CLUSTER_DE,
+        'bucket': buckets,
+        'cluster': clusters,
+        'duplicate_of': duplicate_of,
+        'buckets': dict(sorted(members.items())),
+        'near_duplicates': [[i, j, round(d, 3)] for i, j, d in pairs],
+        'dendrogram': [[i, j, round(d, 3)] for i, j, d in edges],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cluster the color library and write bucket metadata')
+    parser.add_argument('--output', default=META_PATH)
+    parser.add_argument('--report', action='store_true')
+    args = parser.parse_args(argv)
+
+    meta = build_metadata(COLORS)
+    with open(args.output, 'w') as f:
+        json.dump(meta, f, separators=(',', ':'))
+    print(f"{meta['count']} colors, {len(set(meta['cluster']))} clusters at ΔE {CLUSTER_DE}, "
+          f"{len(meta['buckets'])} buckets, {len(meta['near_duplicates'])} near-duplicate pairs")
+    if args.report:
+        for i, j, d in meta['near_duplicates']:
+            a, b = COLORS[i], COLORS[j]
+            print(f"  ΔE {d:5.2f}  {a['name']} {a['hex']}  ~  {b['name']} {b['hex']}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
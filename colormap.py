@@ -0,0 +1,118 @@
+# colormap.py - Continuous colormaps from palettes: OKLab/LCh ramps and their exports
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+from colorspace import hex_to_rgb_array, rgb_to_oklab, gamut_map_oklab, oklab_to_oklch, oklch_to_oklab, to_uint8, rgb_array_to_hex
+
+RAMP_SIZES = (256, 1024, 4096)
+SPACES = ('oklab', 'lch')
+
+_cache = OrderedDict()
+_cache_lock = Lock()
+CACHE_SIZE = 256
+
+def palette_hash(palette):
+    # Stable digest of the packed 24-bit colors, independent of hex casing
+    return hashlib.sha1(hex_to_rgb_array(palette).tobytes()).hexdigest()
+
+def _stop_positions(lab, spacing):
+    if len(lab) == 1:
+        return np.zeros(1)
+    if spacing == 'perceptual':
+        # Distance-proportional stops give an even rate of perceived change
+        steps = np.linalg.norm(np.diff(lab, axis=0), axis=1)
+        total = steps.sum()
+        if total > 0:
+            return np.concatenate([[0.0], np.cumsum(steps) / total])
+    return np.linspace(0.0, 1.0, len(lab))
+
+def _interpolate(lab, positions, n, space):
+    t = np.linspace(0.0, 1.0, n)
+    if len(lab) == 1:
+        return np.repeat(lab, n, axis=0)
+    idx = np.clip(np.searchsorted(positions, t, side='right') - 1, 0, len(lab) - 2)
+    span = positions[idx + 1] - positions[idx]
+    frac = np.where(span > 0, (t - positions[idx]) / np.where(span > 0, span, 1), 0.0)[:, None]
+    if space == 'lch':
+        lch = oklab_to_oklch(lab)
+        a, b = lch[idx], lch[idx + 1]
+        dh = (b[:, 2] - a[:, 2] + 180.0) % 360.0 - 180.0  # Shortest way round the hue circle
+        out = a + frac * (b - a)
+        out[:, 2] = a[:, 2] + frac[:, 0] * dh
+        return oklch_to_oklab(out)
+    return lab[idx] + frac * (lab[idx + 1] - lab[idx])
+
+def build_ramp(palette, n=256, space='oklab', monotone=True, spacing='perceptual'):
+    """
+    Interpolate a palette into an (n, 3) uint8 ramp. With monotone=True the
+    stops are ordered by OKLab lightness, so lightness never reverses along
+    the ramp beyond 8-bit rounding (interpolation is linear in L in both spaces, and out-of-gamut
+    entries lose chroma rather than lightness).
+    """
+    if space not in SPACES:
+        raise ValueError(f"Unknown interpolation space: {space}")
+    lab = rgb_to_oklab(hex_to_rgb_array(palette) / 255.0)
+    if monotone:
+        lab = lab[np.argsort(lab[:, 0], kind='stable')]
+    positions = _stop_positions(lab, spacing)
+    return to_uint8(gamut_map_oklab(_interpolate(lab, positions, n, space)))
+
+def ramp(palette, n=256, space='oklab', monotone=True, spacing='perceptual'):
+    """
+    Cached build_ramp keyed on the palette hash. The returned array is
+    shared between callers and therefore read-only.
+    """
+    key = (palette_hash(palette), n, space, monotone, spacing)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            return hit
+    lut = build_ramp(palette, n, space, monotone, spacing)
+    lut.flags.writeable = False
+    with _cache_lock:
+        _cache[key] = lut
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return lut
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+# EXPORTS
+def to_listed_colormap(lut, name='palette'):
+    from matplotlib.colors import ListedColormap
+    return ListedColormap(np.asarray(lut, dtype=np.float64) / 255.0, name=name)
+
+def to_cpt(lut, z_min=0.0, z_max=1.0):
+    """
+    GMT color palette table: one constant-color slice per ramp entry,
+    plus background/foreground/NaN colors.
+    """
+    lut = np.asarray(lut)
+    n = len(lut)
+    z = np.linspace(z_min, z_max, n + 1)
+    lines = ["# COLOR_MODEL = RGB"]
+    for i, (r, g, b) in enumerate(lut.tolist()):
+        lines.append(f"{z[i]:.6g}\t{r}/{g}/{b}\t{z[i + 1]:.6g}\t{r}/{g}/{b}")
+    r0, g0, b0 = lut[0].tolist()
+    r1, g1, b1 = lut[-1].tolist()
+    lines += [f"B\t{r0}/{g0}/{b0}", f"F\t{r1}/{g1}/{b1}", "N\t128/128/128"]
+    return "\n".join(lines) + "\n"
+
+def to_css_stops(lut, stops=32, direction='to right'):
+    # A high-res ramp needs far fewer CSS stops than entries to look identical
+    lut = np.asarray(lut)
+    idx = np.unique(np.linspace(0, len(lut) - 1, min(stops, len(lut))).round().astype(int))
+    hexes = rgb_array_to_hex(lut[idx])
+    pct = idx / max(len(lut) - 1, 1) * 100.0
+    body = ", ".join(f"{h} {p:.2f}%" for h, p in zip(hexes, pct))
+    return f"linear-gradient({direction}, {body})"
+
+def to_lut_bytes(lut):
+    # Raw interleaved RGB, 3 bytes per entry
+    return np.ascontiguousarray(lut, dtype=np.uint8).tobytes()
@@ -0,0 +1,227 @@
+# colorspace.py - Vectorized sRGB <-> OKLab / OKLCh conversions on NumPy arrays
+import math
+
+import numpy as np
+
+# Björn Ottosson's OKLab matrices
+_LMS_FROM_LINEAR = np.array([
+    [0.4122214708, 0.5363325363, 0.0514459929],
+    [0.2119034982, 0.6806995451, 0.1073969566],
+    [0.0883024619, 0.2817188376, 0.6299787005],
+])
+_LAB_FROM_LMS = np.array([
+    [0.2104542553, 0.7936177850, -0.0040720468],
+    [1.9779984951, -2.4285922050, 0.4505937099],
+    [0.0259040371, 0.7827717662, -0.8086757660],
+])
+_LMS_FROM_LAB = np.linalg.inv(_LAB_FROM_LMS)
+_LINEAR_FROM_LMS = np.linalg.inv(_LMS_FROM_LINEAR)
+
+def hex_to_rgb_array(hexes):
+    # (N, 3) uint8 array from '#RRGGBB' strings
+    joined = "".join(h.lstrip('#') for h in hexes)
+    return np.frombuffer(bytes.fromhex(joined), dtype=np.uint8).reshape(-1, 3).copy()
+
+def rgb_array_to_hex(rgb):
+    rgb = np.asarray(rgb, dtype=np.uint8).reshape(-1, 3)
+    return ['#' + row.tobytes().hex() for row in rgb]
+
+def srgb_to_linear(c):
+    c = np.asarray(c, dtype=np.float64)
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+def linear_to_srgb(c):
+    c = np.asarray(c, dtype=np.float64)
+    return np.where(c <= 0.0031308, c * 12.92, 1.055 * np.abs(c) ** (1 / 2.4) * np.sign(c) - 0.055)
+
+def rgb_to_oklab(rgb):
+    # rgb: (..., 3) floats in [0, 1]
+    lms = srgb_to_linear(rgb) @ _LMS_FROM_LINEAR.T
+    return np.cbrt(lms) @ _LAB_FROM_LMS.T
+
+def oklab_to_linear(lab):
+    lms = (np.asarray(lab, dtype=np.float64) @ _LMS_FROM_LAB.T) ** 3
+    return lms @ _LINEAR_FROM_LMS.T
+
+def oklab_to_rgb(lab):
+    # Unclipped; values outside [0, 1] are out of the sRGB gamut
+    return linear_to_srgb(oklab_to_linear(lab))
+
+def oklab_to_oklch(lab):
+    lab = np.asarray(lab, dtype=np.float64)
+    c = np.hypot(lab[..., 1], lab[..., 2])
+    h = np.degrees(np.arctan2(lab[..., 2], lab[..., 1])) % 360.0
+    return np.stack([lab[..., 0], c, h], axis=-1)
+
+def oklch_to_oklab(lch):
+    lch = np.asarray(lch, dtype=np.float64)
+    h = np.radians(lch[..., 2])
+    return np.stack([lch[..., 0], lch[..., 1] * np.cos(h), lch[..., 1] * np.sin(h)], axis=-1)
+
+# Largest in-gamut OKLCh chroma per (hue degree, lightness step), built on first use
+LUT_HUES = 360
+LUT_LIGHTNESS = 101
+_chroma_lut = None
+
+def max_chroma_lut(iterations=24):
+    """
+    (LUT_HUES, LUT_LIGHTNESS) array of the sRGB gamut boundary in OKLCh,
+    bisecting chroma for every cell at once. At fixed hue and lightness the
+    in-gamut chromas form one interval from the gray axis, so bisection is exact.
+    """
+    global _chroma_lut
+    if _chroma_lut is None:
+        hue, lightness = np.meshgrid(np.arange(LUT_HUES) * (360.0 / LUT_HUES), np.linspace(0.0, 1.0, LUT_LIGHTNESS), indexing='ij')
+        lo = np.zeros(hue.shape)
+        hi = np.full(hue.shape, 0.5)
+        for _ in range(iterations):
+            mid = (lo + hi) / 2
+            ok = in_gamut(oklab_to_rgb(oklch_to_oklab(np.stack([lightness, mid, hue], axis=-1))))
+            lo = np.where(ok, mid, lo)
+            hi = np.where(ok, hi, mid)
+        _chroma_lut = lo
+    return _chroma_lut
+
+def max_chroma(hue, lightness):
+    # Smallest of the four surrounding LUT cells, so the lookup errs toward in-gamut
+    lut = max_chroma_lut()
+    hf = (np.asarray(hue, dtype=np.float64) % 360.0) / (360.0 / LUT_HUES)
+    lf = np.clip(lightness, 0.0, 1.0) * (LUT_LIGHTNESS - 1)
+    h0 = np.floor(hf).astype(int) % LUT_HUES
+    h1 = (h0 + 1) % LUT_HUES
+    l0 = np.floor(lf).astype(int)
+    l1 = np.minimum(l0 + 1, LUT_LIGHTNESS - 1)
+    return np.minimum(np.minimum(lut[h0, l0], lut[h0, l1]), np.minimum(lut[h1, l0], lut[h1, l1]))
+
+def oklch_to_rgb_mapped(lch):
+    """
+    OKLCh (..., 3) of (L, C, hue degrees) to sRGB floats in [0, 1]. Lightness
+    is clamped and, for colors outside sRGB, chroma is reduced to the gamut
+    boundary at the same hue, so hue and lightness survive where plain
+    clipping would shift them.
+    """
+    lch = np.asarray(lch, dtype=np.float64)
+    lightness = np.clip(lch[..., 0], 0.0, 1.0)
+    chroma = np.maximum(lch[..., 1], 0.0)
+    rgb = oklab_to_rgb(oklch_to_oklab(np.stack([lightness, chroma, lch[..., 2]], axis=-1)))
+    out = ~in_gamut(rgb)
+    if out.any():
+        chroma = np.where(out, np.minimum(chroma, max_chroma(lch[..., 2], lightness)), chroma)
+        rgb = oklab_to_rgb(oklch_to_oklab(np.stack([lightness, chroma, lch[..., 2]], axis=-1)))
+    return np.clip(rgb, 0.0, 1.0)
+
+# Scalar versions for per-color callers, in plain Python to skip NumPy call overhead
+_LMS_FROM_LINEAR_L = _LMS_FROM_LINEAR.tolist()
+_LAB_FROM_LMS_L = _LAB_FROM_LMS.tolist()
+_LMS_FROM_LAB_L = _LMS_FROM_LAB.tolist()
+_LINEAR_FROM_LMS_L = _LINEAR_FROM_LMS.tolist()
+_chroma_rows = None
+
+def _mul(m, v):
+    return [m[0][0] * v[0] + m[0][1] * v[1] + m[0][2] * v[2],
+            m[1][0] * v[0] + m[1][1] * v[1] + m[1][2] * v[2],
+            m[2][0] * v[0] + m[2][1] * v[1] + m[2][2] * v[2]]
+
+def rgb8_to_oklch(rgb):
+    # (r, g, b) 0-255 -> (L, C, hue degrees)
+    linear = [c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4 for c in (x / 255.0 for x in rgb)]
+    lab = _mul(_LAB_FROM_LMS_L, [math.copysign(abs(x) ** (1 / 3), x) for x in _mul(_LMS_FROM_LINEAR_L, linear)])
+    return lab[0], math.hypot(lab[1], lab[2]), math.degrees(math.atan2(lab[2], lab[1])) % 360.0
+
+def _oklch_to_linear(lightness, chroma, hue):
+    h = math.radians(hue)
+    lms = _mul(_LMS_FROM_LAB_L, [lightness, chroma * math.cos(h), chroma * math.sin(h)])
+    return _mul(_LINEAR_FROM_LMS_L, [x ** 3 for x in lms])
+
+def oklch_to_rgb8(lightness, chroma, hue):
+    """
+    Scalar oklch_to_rgb_mapped, rounded to (r, g, b) 0-255.
+    """
+    global _chroma_rows
+    lightness = min(1.0, max(0.0, lightness))
+    chroma = max(0.0, chroma)
+    linear = _oklch_to_linear(lightness, chroma, hue)
+    if not all(-1e-6 <= c <= 1 + 1e-6 for c in linear):
+        if _chroma_rows is None:
+            _chroma_rows = max_chroma_lut().tolist()
+        hf = (hue % 360.0) / (360.0 / LUT_HUES)
+        lf = lightness * (LUT_LIGHTNESS - 1)
+        h0, l0 = int(hf) % LUT_HUES, int(lf)
+        h1, l1 = (h0 + 1) % LUT_HUES, min(l0 + 1, LUT_LIGHTNESS - 1)
+        limit = min(_chroma_rows[h0][l0], _chroma_rows[h0][l1], _chroma_rows[h1][l0], _chroma_rows[h1][l1])
+        linear = _oklch_to_linear(lightness, min(chroma, limit), hue)
+    out = []
+    for c in linear:
+        c = min(1.0, max(0.0, c))
+        c = c * 12.92 if c <= 0.0031308 else 1.055 * c ** (1 / 2.4) - 0.055
+        out.append(min(255, max(0, int(round(c * 255)))))
+    return tuple(out)
+
+def hls_to_rgb(hls):
+    """
+    colorsys.hls_to_rgb over an (..., 3) array of (h, l, s). Inputs outside
+    [0, 1] are not clamped, so results match colorsys element for element.
+    """
+    hls = np.asarray(hls, dtype=np.float64)
+    h, l, s = hls[..., 0], hls[..., 1], hls[..., 2]
+    m2 = np.where(l <= 0.5, l * (1.0 + s), l + s - l * s)
+    m1 = 2.0 * l - m2
+    def channel(hue):
+        hue = hue % 1.0
+        return np.select(
+            [hue < 1 / 6, hue < 0.5, hue < 2 / 3],
+            [m1 + (m2 - m1) * hue * 6.0, m2, m1 + (m2 - m1) * (2 / 3 - hue) * 6.0],
+            m1,
+        )
+    rgb = np.stack([channel(h + 1 / 3), channel(h), channel(h - 1 / 3)], axis=-1)
+    return np.where((s == 0.0)[..., None], l[..., None], rgb)
+
+def hls_to_uint8(hls):
+    # Same truncate-and-clamp as utils.hsl_to_rgb
+    return np.clip(np.trunc(hls_to_rgb(hls) * 255), 0, 255).astype(np.uint8)
+
+def to_uint8(rgb):
+    return np.clip(np.rint(np.asarray(rgb) * 255.0), 0, 255).astype(np.uint8)
+
+def hex_to_oklab(hexes):
+    return rgb_to_oklab(hex_to_rgb_array(hexes) / 255.0)
+
+def in_gamut(rgb, eps=1e-6):
+    rgb = np.asarray(rgb)
+    return np.all((rgb >= -eps) & (rgb <= 1 + eps), axis=-1)
+
+def gamut_map_oklab(lab, iterations=16):
+    """
+    Bring OKLab colors into sRGB by shrinking chroma at constant lightness
+    and hue, bisecting the scale factor for every color at once.
+    Returns sRGB floats in [0, 1].
+    """
+    lab = np.asarray(lab, dtype=np.float64)
+    rgb = oklab_to_rgb(lab)
+    out = ~in_gamut(rgb)
+    if not out.any():
+        return np.clip(rgb, 0.0, 1.0)
+    sub = lab[out]
+    sub[:, 0] = np.clip(sub[:, 0], 0.0, 1.0)
+    lo = np.zeros(len(sub))
+    hi = np.ones(len(sub))
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        ok = in_gamut(oklab_to_rgb(np.column_stack([sub[:, 0], sub[:, 1:] * mid[:, None]])))
+        lo = np.where(ok, mid, lo)
+        hi = np.where(ok, hi, mid)
+    rgb[out] = oklab_to_rgb(np.column_stack([sub[:, 0], sub[:, 1:] * lo[:, None]]))
+    return np.clip(rgb, 0.0, 1.0)
+
+# CIELAB (D65), for classic ΔE thresholds
+_XYZ_FROM_LINEAR = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+_D65 = np.array([0.95047, 1.0, 1.08883])
+
+def rgb_to_cielab(rgb):
+    xyz = (srgb_to_linear(rgb) @ _XYZ_FROM_LINEAR.T) / _D65
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
@@ -0,0 +1,155 @@
+# export.py - Palette export formats (ASE, GPL, SVG, CSS variables, Tailwind) and zip bundling
+#
+# Every writer takes a list of packed (N, 3) uint8 RGB arrays plus palette names
+# and yields bytes chunks, so a bundle is streamed into the zip one chunk at a time.
+import json
+import re
+import struct
+import zipfile
+
+import numpy as np
+
+from colorspace import hex_to_rgb_array, rgb_array_to_hex
+
+def pack_palettes(palettes):
+    return [hex_to_rgb_array(p) for p in palettes]
+
+def _slug(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'palette'
+
+def _color_names(rgb, name_of):
+    return [name_of(h, h.upper()) for h in rgb_array_to_hex(rgb)]
+
+def _default_name_of(hex_str, default):
+    return default
+
+# Adobe Swatch Exchange: big-endian blocks, one group per palette
+def _ase_string(text):
+    encoded = (text + '\0').encode('utf-16-be')
+    return struct.pack('>H', len(encoded) // 2) + encoded
+
+def write_ase(packed, names, name_of=_default_name_of):
+    blocks = sum(len(rgb) + 2 for rgb in packed)
+    yield b'ASEF' + struct.pack('>HHI', 1, 0, blocks)
+    for rgb, title in zip(packed, names):
+        body = _ase_string(title)
+        yield struct.pack('>HI', 0xC001, len(body)) + body
+        floats = (rgb / 255.0).astype('>f4')
+        for color_name, values in zip(_color_names(rgb, name_of), floats):
+            body = _ase_string(color_name) + b'RGB ' + values.tobytes() + struct.pack('>H', 2)
+            yield struct.pack('>HI', 0x0001, len(body)) + body
+        yield struct.pack('>HI', 0xC002, 0)
+
+# GIMP palette, one file per palette
+def write_gpl(rgb, title, name_of=_default_name_of):
+    yield f"GIMP Palette\nName: {title}\nColumns: {len(rgb)}\n#\n".encode('utf-8')
+    lines = [f"{r:3d} {g:3d} {b:3d}\t{n}\n" for (r, g, b), n in zip(rgb.tolist(), _color_names(rgb, name_of))]
+    yield "".join(lines).encode('utf-8')
+
+def write_svg(packed, names, swatch=40, gap=4, label_width=120):
+    width = label_width + max((len(rgb) for rgb in packed), default=0) * (swatch + gap)
+    height = len(packed) * (swatch + gap)
+    yield (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+           f'viewBox="0 0 {width} {height}">\n').encode('utf-8')
+    for row, (rgb, title) in enumerate(zip(packed, names)):
+        y = row * (swatch + gap)
+        parts = [f'<text x="0" y="{y + swatch // 2 + 5}" font-family="sans-serif" font-size="12">'
+                 f'{_xml(title)}</text>\n']
+        for col, hex_str in enumerate(rgb_array_to_hex(rgb)):
+            x = label_width + col * (swatch + gap)
+            parts.append(f'<rect x="{x}" y="{y}" width="{swatch}" height="{swatch}" fill="{hex_str}"/>\n')
+        yield "".join(parts).encode('utf-8')
+    yield b'</svg>\n'
+
+def _xml(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+def write_css(packed, names):
+    yield b':root {\n'
+    for rgb, title in zip(packed, names):
+        slug = _slug(title)
+        yield "".join(f"  --{slug}-{i + 1}: {h};\n" for i, h in enumerate(rgb_array_to_hex(rgb))).encode('utf-8')
+    yield b'}\n'
+
+TAILWIND_SHADES = (50, 100, 200, 300, 400, 500, 600, 700, 800, 900, 950)
+
+def _tailwind_keys(n):
+    # 100-900 as before, widened with 50 and 950 for 10 or 11 colors. Tailwind
+    # has no more shade names than that, so longer palettes use 1..n.
+    if n <= 9:
+        return [(i + 1) * 100 for i in range(n)]
+    if n <= len(TAILWIND_SHADES):
+        return list(TAILWIND_SHADES[:n])
+    return list(range(1, n + 1))
+
+def write_tailwind(packed, names):
+    yield b'/** @type {import(\'tailwindcss\').Config} */\nmodule.exports = {\n  theme: {\n    extend: {\n      colors: {\n'
+    for rgb, title in zip(packed, names):
+        hexes = rgb_array_to_hex(rgb)
+        shades = ", ".join(f"{key}: '{h}'" for key, h in zip(_tailwind_keys(len(hexes)), hexes))
+        yield f"        {json.dumps(_slug(title))}: {{ {shades} }},\n".encode('utf-8')
+    yield b'      },\n    },\n  },\n};\n'
+
+def bundle_files(palettes, names=None, name_of=_default_name_of):
+    """
+    Yield (filename, chunk_iterator) pairs for every export format.
+    """
+    packed = pack_palettes(palettes)
+    names = list(names) if names else [f"Palette {i + 1}" for i in range(len(packed))]
+    yield 'palettes.ase', write_ase(packed, names, name_of)
+    for rgb, title in zip(packed, names):
+        yield f'gpl/{_slug(title)}.gpl', write_gpl(rgb, title, name_of)
+    yield 'palettes.svg', write_svg(packed, names)
+    yield 'palettes.css', write_css(packed, names)
+    yield 'tailwind.config.js', write_tailwind(packed, names)
+
+def write_zip(fileobj, palettes, names=None, name_of=_default_name_of):
+    # Chunks go straight into the deflate stream; fileobj need not be seekable
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for filename, chunks in bundle_files(palettes, names, name_of):
+            with zf.open(filename, 'w') as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+    return fileobj
+
+class _ChunkSink:
+    # Minimal unseekable file object that hands written bytes back to a generator
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        out, self.chunks = b"".join(self.chunks), []
+        return out
+
+def iter_zip(palettes, names=None, name_of=_default_name_of):
+    """
+    Generate the zip bundle as a stream of bytes chunks, e.g. for an HTTP
+    response, without holding the whole archive in memory.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for filename, chunks in bundle_files(palettes, names, name_of):
+            with zf.open(filename, 'w') as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
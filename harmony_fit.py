@@ -0,0 +1,229 @@
+# harmony_fit.py - Inverse harmony search: which style and base color best reproduce a palette
+#
+# Usage:
+#   python harmony_fit.py '#45B1E8' '#E87E45' '#B1E845'
+#
+# Candidates are (deterministic style, base color, slider values). Base colors
+# come from the target itself plus library colors at nearby hues (HueIndex);
+# sliders are searched on the UI's grid, coarser where a style reads both,
+# then refined around the best fits.
+# Palettes are compared order-free: CIELAB ΔE76 cost matrices for a whole
+# batch of candidates at once give a cheap lower bound, and only candidates
+# that could still make the top k get an exact Hungarian assignment.
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+from clustering import NEUTRAL_CHROMA
+from colors import COLORS
+from colorspace import hex_to_rgb_array, rgb_to_cielab, rgb_to_oklab, oklab_to_oklch
+from utils import STYLE_REGISTRY, generate_palette
+
+BUDGET_S = 0.25
+COARSE_STEP = 0.1
+FINE_STEP = 0.05
+HUE_TOLERANCE = 15.0   # degrees around each target hue searched for library bases
+MAX_LIBRARY_BASES = 12
+UNMATCHED_DE = 50.0    # cost of a target or candidate color left without a partner
+
+def _lab(palettes):
+    return rgb_to_cielab(hex_to_rgb_array([c for p in palettes for c in p]) / 255.0)
+
+class HueIndex:
+    """
+    Library colors sorted by OKLCh hue, with neutrals (chroma below
+    NEUTRAL_CHROMA) kept apart since their hue is noise. near() returns the
+    library colors closest to a palette, looking only at matching hues.
+    """
+
+    def __init__(self, colors=COLORS):
+        self.hexes = [c['hex'].upper() for c in colors]
+        rgb = hex_to_rgb_array(self.hexes) / 255.0
+        lch = oklab_to_oklch(rgb_to_oklab(rgb))
+        self.lab = rgb_to_cielab(rgb)
+        chromatic = np.flatnonzero(lch[:, 1] >= NEUTRAL_CHROMA)
+        order = np.argsort(lch[chromatic, 2])
+        self.rows = chromatic[order]
+        self.hues = lch[self.rows, 2]
+        self.neutrals = np.flatnonzero(lch[:, 1] < NEUTRAL_CHROMA)
+
+    def _hue_window(self, hue, tolerance):
+        lo, hi = hue - tolerance, hue + tolerance
+        spans = [(lo, hi)] + ([(lo + 360, 360)] if lo < 0 else []) + ([(0, hi - 360)] if hi > 360 else [])
+        return np.concatenate([self.rows[np.searchsorted(self.hues, a):np.searchsorted(self.hues, b, 'right')] for a, b in spans])
+
+    def near(self, palette, limit=MAX_LIBRARY_BASES, tolerance=HUE_TOLERANCE):
+        rgb = hex_to_rgb_array(palette) / 255.0
+        lch = oklab_to_oklch(rgb_to_oklab(rgb))
+        lab = rgb_to_cielab(rgb)
+        rows = [self.neutrals if c < NEUTRAL_CHROMA else self._hue_window(h, tolerance) for _, c, h in lch.tolist()]
+        rows = np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+        if not len(rows):
+            return []
+        d = np.sqrt(((self.lab[rows, None, :] - lab[None, :, :]) ** 2).sum(axis=-1)).min(axis=1)
+        return [self.hexes[i] for i in rows[np.argsort(d, kind='stable')[:limit]].tolist()]
+
+def assignment(cost):
+    """
+    Minimum-cost perfect matching on a square cost matrix (Hungarian method
+    with potentials, O(n^3)). Returns (col for each row, total cost).
+    """
+    n = len(cost)
+    u = np.zeros(n + 1)
+    v = np.zeros(n + 1)
+    match = np.zeros(n + 1, dtype=np.int64)  # match[col] = row, 1-based; 0 = free
+    way = np.zeros(n + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        match[0] = row
+        col0 = 0
+        minv = np.full(n + 1, np.inf)
+        used = np.zeros(n + 1, dtype=bool)
+        while True:
+            used[col0] = True
+            r = match[col0]
+            reduced = cost[r - 1] - u[r] - v[1:]
+            free = ~used[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = col0
+            cand = np.where(free, minv[1:], np.inf)
+            col1 = int(np.argmin(cand)) + 1
+            delta = cand[col1 - 1]
+            u[match[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            col0 = col1
+            if match[col0] == 0:
+                break
+        while col0:
+            col1 = way[col0]
+            match[col0] = match[col1]
+            col0 = col1
+    cols = np.empty(n, dtype=np.int64)
+    cols[match[1:] - 1] = np.arange(n)
+    return cols, float(cost[np.arange(n), cols].sum())
+
+def _cost_matrices(target_lab, candidate_lab):
+    # (count, m, 3) candidates -> (count, size, size) costs, padded with UNMATCHED_DE
+    n, (count, m) = len(target_lab), candidate_lab.shape[:2]
+    size = max(n, m)
+    cost = np.full((count, size, size), UNMATCHED_DE)
+    cost[:, :n, :m] = np.sqrt(((target_lab[None, :, None, :] - candidate_lab[:, None, :, :]) ** 2).sum(axis=-1))
+    return cost
+
+def _grid(style):
+    # Fine steps for one-slider styles; styles reading both start coarse and are refined later
+    params = STYLE_REGISTRY[style]['params']
+    both = 'hue_shift' in params and 'saturation_boost' in params
+    values = np.round(np.arange(0, 1 + 1e-9, COARSE_STEP if both else FINE_STEP), 4).tolist()
+    # Sliders a style ignores stay at generate_palette's defaults
+    hues = values if 'hue_shift' in params else [0.1]
+    sats = values if 'saturation_boost' in params else [0.5]
+    return [(h, s) for h in hues for s in sats]
+
+class _TopK:
+    # Best k exact fits seen so far, one per distinct palette
+    def __init__(self, k):
+        self.k = k
+        self.fits = []
+
+    @property
+    def bound(self):
+        return self.fits[-1]['delta_e'] if len(self.fits) >= self.k else math.inf
+
+    def offer(self, fit):
+        if any(f['palette'] == fit['palette'] for f in self.fits):
+            return
+        self.fits.append(fit)
+        self.fits.sort(key=lambda f: f['delta_e'])
+        del self.fits[self.k:]
+
+def _evaluate(target_lab, candidates, top):
+    """
+    Score a batch of (style, base_hex, hue_shift, saturation_boost, palette)
+    candidates. Lower bounds for the whole batch come from one vectorized
+    pass; the exact assignment only runs while a candidate can still beat
+    the current k-th best.
+    """
+    n = len(target_lab)
+    by_len = {}
+    for cand in candidates:
+        if cand[4]:
+            by_len.setdefault(len(cand[4]), []).append(cand)
+    for m, group in by_len.items():
+        cost = _cost_matrices(target_lab, _lab([c[4] for c in group]).reshape(len(group), m, 3))
+        size = max(n, m)
+        bound = np.maximum(cost.min(axis=2).sum(axis=1), cost.min(axis=1).sum(axis=1)) / size
+        for i in np.argsort(bound, kind='stable').tolist():
+            if bound[i] >= top.bound:
+                break
+            cols, total = assignment(cost[i])
+            style, base_hex, hue_shift, saturation_boost, palette = group[i]
+            top.offer({
+                'style': style, 'base_hex': base_hex, 'hue_shift': hue_shift,
+                'saturation_boost': saturation_boost, 'palette': palette,
+                'delta_e': total / size,
+            })
+
+def fit_palette(palette, k=5, budget_s=BUDGET_S, index=None, styles=None, lookup=None):
+    """
+    Top k (style, base color, sliders) fits for a target palette, best
+    first, as dicts with style, base_hex, num_colors, hue_shift,
+    saturation_boost, the reproduced palette and its mean matched ΔE. Bases are tried most
+    promising first and the search stops once budget_s has elapsed.
+    lookup, if given, is tried before generate_palette (e.g.
+    MaterializedTable.lookup) and may return None.
+    """
+    deadline = time.perf_counter() + budget_s
+    target = [h.upper() for h in palette]
+    target_lab = _lab([target])
+    num_colors = min(max(len(target), 3), 20)
+    styles = styles or [name for name, e in STYLE_REGISTRY.items() if e['deterministic']]
+    index = index or HueIndex()
+    bases = list(dict.fromkeys(target + index.near(target)))
+    top = _TopK(k)
+
+    def generate(style, base_hex, h, s):
+        out = lookup(style, base_hex, num_colors, h, s) if lookup else None
+        return out if out is not None else generate_palette(base_hex, style, num_colors, h, s)
+
+    # Grid pass, one base color at a time
+    for base_hex in bases:
+        batch = [(style, base_hex, h, s, generate(style, base_hex, h, s)) for style in styles for h, s in _grid(style)]
+        _evaluate(target_lab, batch, top)
+        if time.perf_counter() > deadline:
+            break
+    # Refine the coarse fits on the fine grid around them
+    for fit in list(top.fits):
+        if time.perf_counter() > deadline:
+            break
+        if len(_grid(fit['style'])) <= 1 / FINE_STEP + 1:
+            continue  # already searched on the fine grid
+        batch = []
+        for dh in (-FINE_STEP, 0, FINE_STEP):
+            for ds in (-FINE_STEP, 0, FINE_STEP):
+                h, s = round(fit['hue_shift'] + dh, 4), round(fit['saturation_boost'] + ds, 4)
+                if (dh or ds) and 0 <= h <= 1 and 0 <= s <= 1:
+                    batch.append((fit['style'], fit['base_hex'], h, s, generate(fit['style'], fit['base_hex'], h, s)))
+        _evaluate(target_lab, batch, top)
+    for fit in top.fits:
+        fit['num_colors'] = num_colors
+    return top.fits
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find the style, base color and sliders that best reproduce a palette')
+    parser.add_argument('colors', nargs='+', help='hex colors')
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=BUDGET_S, help='seconds')
+    args = parser.parse_args(argv)
+
+    for fit in fit_palette(args.colors, args.k, args.budget):
+        print(f"{fit['delta_e']:6.2f}  {fit['style']} of {fit['base_hex']}  hue_shift {fit['hue_shift']:.2f}  "
+              f"saturation_boost {fit['saturation_boost']:.2f}  {' '.join(fit['palette'])}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# importer.py - Streaming bulk import of CSV / JSON / GPL color lists into a ColorLibrary
+import csv
+import io
+import json
+import os
+
+import numpy as np
+
+CHUNK_SIZE = 4096
+HEX_COLUMNS = ('hex', 'color', 'colour', 'value', 'code')
+NAME_COLUMNS = ('name', 'title', 'label')
+
+# ASCII byte -> nibble value, 255 for anything that isn't a hex digit
+_NIBBLE = np.full(256, 255, dtype=np.uint8)
+_NIBBLE[np.frombuffer(b'0123456789', dtype=np.uint8)] = np.arange(10)
+_NIBBLE[np.frombuffer(b'abcdef', dtype=np.uint8)] = np.arange(10, 16)
+_NIBBLE[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = np.arange(10, 16)
+
+def decode_hex(hexes):
+    """
+    Decode a batch of '#RRGGBB' / 'RRGGBB' strings in one pass.
+    Returns (rgb, valid): an (N, 3) uint8 array and a boolean mask; rows
+    where valid is False hold garbage and must be dropped.
+    """
+    # Non-ASCII input can't be hex; blank it so it fails validation
+    cleaned = [h.strip().lstrip('#') if h.isascii() else '' for h in hexes]
+    # One spare byte per row so 7+ character inputs can be detected and rejected
+    raw = np.array(cleaned, dtype='S7').view(np.uint8).reshape(-1, 7)
+    nibbles = _NIBBLE[raw[:, :6]]
+    valid = (nibbles < 16).all(axis=1) & (raw[:, 6] == 0)
+    rgb = (nibbles[:, 0::2] << 4) | (nibbles[:, 1::2] & 15)
+    return rgb.astype(np.uint8), valid
+
+def valid_hex_mask(hexes):
+    return decode_hex(hexes)[1]
+
+def pack_rgb(rgb):
+    # 24-bit integer per color, used as the dedupe key
+    rgb = np.asarray(rgb, dtype=np.uint32)
+    return (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+
+def _chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# READERS: each yields (name, hex_or_rgb) pairs lazily from a text stream
+def _read_csv(fh):
+    reader = csv.reader(fh)
+    header = next(reader, None)
+    if header is None:
+        return
+    lowered = [h.strip().lower() for h in header]
+    hex_col = next((lowered.index(c) for c in HEX_COLUMNS if c in lowered), None)
+    name_col = next((lowered.index(c) for c in NAME_COLUMNS if c in lowered), None)
+    if hex_col is None:
+        # Headerless file: the first row is data, find the hex-looking column
+        flags = valid_hex_mask(header)
+        hex_col = int(np.argmax(flags)) if flags.any() else 0
+        name_col = next((i for i in range(len(header)) if i != hex_col), None)
+        yield (header[name_col] if name_col is not None else ''), header[hex_col]
+    for row in reader:
+        if len(row) <= hex_col:
+            continue
+        yield (row[name_col] if name_col is not None and name_col < len(row) else ''), row[hex_col]
+
+def _iter_json_values(fh, read_size=1 << 16):
+    # Incrementally decode the items of a top-level JSON array or of JSON Lines
+    decoder = json.JSONDecoder()
+    buf = ''
+    eof = False
+    while True:
+        buf = buf.lstrip(' \t\r\n,[')
+        if buf.startswith(']'):
+            return
+        if buf:
+            try:
+                value, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield value
+                buf = buf[end:]
+                continue
+        if eof:
+            return
+        data = fh.read(read_size)
+        eof = not data
+        buf += data
+
+def _read_json(fh):
+    for item in _iter_json_values(fh):
+        if isinstance(item, str):
+            yield '', item
+        elif isinstance(item, dict):
+            lowered = {str(k).lower(): v for k, v in item.items()}
+            hex_value = next((lowered[c] for c in HEX_COLUMNS if c in lowered), None)
+            if isinstance(hex_value, str):
+                name = next((lowered[c] for c in NAME_COLUMNS if c in lowered), '')
+                yield str(name), hex_value
+
+def _read_gpl(fh):
+    for line in fh:
+        line = line.strip()
+        if not line or line.startswith('#') or line.startswith('GIMP Palette') or ':' in line.split('\t')[0]:
+            continue
+        parts = line.split(None, 3)
+        if len(parts) < 3:
+            continue
+        try:
+            rgb = tuple(int(p) for p in parts[:3])
+        except ValueError:
+            continue
+        yield (parts[3] if len(parts) > 3 else ''), rgb
+
+READERS = {'csv': _read_csv, 'json': _read_json, 'jsonl': _read_json, 'gpl': _read_gpl}
+
+def detect_format(filename):
+    ext = os.path.splitext(filename)[1].lower().lstrip('.')
+    if ext not in READERS:
+        raise ValueError(f"Unsupported color list format: .{ext}")
+    return ext
+
+def import_colors(library, source, fmt, source_name='Imported', chunk_size=CHUNK_SIZE):
+    """
+    Stream colors from source (a path, text stream or binary stream) into
+    library. Hex columns are decoded and validated a chunk at a time, and
+    colors whose RGB is already in the library or earlier in the file are
+    skipped. Returns counts of rows read, invalid rows, duplicates and colors added.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, encoding='utf-8', newline='') as fh:
+            return import_colors(library, fh, fmt, source_name, chunk_size)
+    if not isinstance(source, io.TextIOBase) and hasattr(source, 'read'):
+        source = io.TextIOWrapper(source, encoding='utf-8', newline='')
+
+    seen = np.unique(pack_rgb(library.rgb)) if len(library) else np.empty(0, dtype=np.uint32)
+    stats = {'read': 0, 'invalid': 0, 'duplicates': 0, 'added': 0}
+    for chunk in _chunked(READERS[fmt](source), chunk_size):
+        names = [name for name, _ in chunk]
+        values = [value for _, value in chunk]
+        stats['read'] += len(chunk)
+        if fmt == 'gpl':
+            rgb = np.array(values, dtype=np.int64).reshape(-1, 3)
+            valid = ((rgb >= 0) & (rgb <= 255)).all(axis=1)
+            rgb = rgb.astype(np.uint8)
+        else:
+            rgb, valid = decode_hex(values)
+        stats['invalid'] += int((~valid).sum())
+
+        idx = np.flatnonzero(valid)
+        packed = pack_rgb(rgb[idx])
+        # First occurrence within the chunk, then drop anything already known
+        _, first = np.unique(packed, return_index=True)
+        first.sort()
+        fresh = first[~np.isin(packed[first], seen, assume_unique=True)]
+        stats['duplicates'] += len(idx) - len(fresh)
+        if not len(fresh):
+            continue
+        seen = np.union1d(seen, packed[fresh])
+
+        rows = idx[fresh]
+        blob = rgb[rows].tobytes().hex().upper()
+        hexes = ['#' + blob[i:i + 6] for i in range(0, len(blob), 6)]
+        entries = [
+            {'name': names[r].strip() or h, 'hex': h, 'vibe': 'Imported', 'why_underrated': source_name}
+            for r, h in zip(rows.tolist(), hexes)
+        ]
+        stats['added'] += library.add(entries, rgb=rgb[rows])
+    return stats
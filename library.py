@@ -0,0 +1,56 @@
+# library.py - Indexed color library: COLORS plus custom and imported colors
+import numpy as np
+
+from colorspace import hex_to_rgb_array
+
+class ColorLibrary:
+    """
+    List of color dicts with a hex -> entry index and a lazily built packed
+    RGB array. Entries are only ever appended, so indexes update in place and
+    version bumps on every change for downstream memoization.
+    """
+
+    def __init__(self, colors=()):
+        self.colors = []
+        self.by_hex = {}
+        self.version = 0
+        self._rgb_chunks = []
+        self._rgb = np.empty((0, 3), dtype=np.uint8)
+        self.add(colors)
+
+    def __len__(self):
+        return len(self.colors)
+
+    def __iter__(self):
+        return iter(self.colors)
+
+    def add(self, entries, rgb=None):
+        # rgb: optional (N, 3) uint8 array already decoded by the caller
+        entries = list(entries)
+        if not entries:
+            return 0
+        start = len(self.colors)
+        self.colors.extend(entries)
+        for entry in entries:
+            # First entry wins, matching the old linear scan
+            self.by_hex.setdefault(entry['hex'].upper(), entry)
+        if rgb is None:
+            rgb = hex_to_rgb_array([e['hex'] for e in entries])
+        self._rgb_chunks.append(np.asarray(rgb, dtype=np.uint8).reshape(-1, 3))
+        self.version += 1
+        return len(self.colors) - start
+
+    def name_of(self, hex_str, default="Generated"):
+        entry = self.by_hex.get(hex_str.upper())
+        return entry['name'] if entry else default
+
+    @property
+    def rgb(self):
+        # (N, 3) uint8, row i matches self.colors[i]
+        if self._rgb_chunks:
+            self._rgb = np.concatenate([self._rgb] + self._rgb_chunks)
+            self._rgb_chunks = []
+        return self._rgb
+
+    def hexes(self):
+        return [c['hex'] for c in self.colors]
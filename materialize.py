@@ -0,0 +1,279 @@
+# materialize.py - Precomputed palette table for the deterministic styles
+#
+# Usage:
+#   python materialize.py                  # build tables for every COLORS entry
+#   python materialize.py --jobs 8         # in parallel
+#   python materialize.py --max-bytes 0    # no per-style size limit
+#   python materialize.py --add '#45B1E8'  # append rows to the existing table
+#
+# Every cacheable style is evaluated for each library color over the UI's
+# slider grid (3-20 colors, hue_shift / saturation_boost in steps of STEP),
+# and stored as one raw uint32 file per style, memory-mapped at serve time.
+# Only the sliders a style reads (its registry params) are part of its grid;
+# styles whose table would exceed --max-bytes are left to the normal cache.
+# The manifest records a digest of every style's output on a small probe
+# grid (rules_digest); a table whose digest no longer matches the current
+# rules is ignored until it is rebuilt.
+#
+# Writers (build, refresh) hold an exclusive lock on LOCK_FILE, so several
+# server processes sharing one directory never append over each other.
+import argparse
+import functools
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: only the in-process lock applies
+
+import numpy as np
+
+from colors import COLORS
+from utils import STYLE_REGISTRY, generate_palette
+
+DEFAULT_DIR = os.environ.get('PALETTE_TABLE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'materialized'))
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+MIN_COLORS, MAX_COLORS = 3, 20
+STEP = 0.05
+STEPS = int(round(1 / STEP)) + 1
+LOCK_FILE = 'table.lock'
+PROBE_BASES = ('#45B1E8', '#E87E45', '#F5F5DC', '#1B1B1B')
+
+# One uint32 per color: 0xRRGGBB, bit 24 set when the hex was uppercase, EMPTY past the end.
+# A few styles (monochrome) can return more than MAX_COLORS; those cells start
+# with OVERFLOW and are computed at serve time instead.
+UPPER = 1 << 24
+EMPTY = 0xFFFFFFFF
+OVERFLOW = 0xFFFFFFFE
+
+def grid_index(value):
+    # Slider value -> grid step, or None when it isn't on the grid
+    k = round(value / STEP)
+    return k if 0 <= k < STEPS and abs(value - k * STEP) < 1e-9 else None
+
+def style_grid(name):
+    params = STYLE_REGISTRY[name]['params']
+    return (STEPS if 'hue_shift' in params else 1, STEPS if 'saturation_boost' in params else 1)
+
+def row_shape(name):
+    # Cells per library color: num_colors x hue steps x saturation steps x colors
+    hs, ss = style_grid(name)
+    return (MAX_COLORS - MIN_COLORS + 1, hs, ss, MAX_COLORS)
+
+def table_styles(max_bytes=DEFAULT_MAX_BYTES, rows=len(COLORS)):
+    names = []
+    for name, entry in STYLE_REGISTRY.items():
+        if not entry['cacheable']:
+            continue
+        if max_bytes and rows * int(np.prod(row_shape(name))) * 4 > max_bytes:
+            continue
+        names.append(name)
+    return names
+
+def encode(palette):
+    cells = np.full(MAX_COLORS, EMPTY, dtype=np.uint32)
+    if len(palette) > MAX_COLORS:
+        cells[0] = OVERFLOW
+        return cells
+    for i, h in enumerate(palette):
+        cells[i] = int(h.lstrip('#'), 16) | (UPPER if h != h.lower() else 0)
+    return cells
+
+def decode(cells):
+    cells = cells.tolist()
+    if cells[0] == OVERFLOW:
+        return None
+    out = []
+    for v in cells:
+        if v == EMPTY:
+            break
+        out.append(f"#{v & 0xFFFFFF:06X}" if v & UPPER else f"#{v & 0xFFFFFF:06x}")
+    return out
+
+def build_row(name, base_hex):
+    # Every grid cell of one style for one base color
+    hs, ss = style_grid(name)
+    row = np.empty(row_shape(name), dtype=np.uint32)
+    for n in range(MIN_COLORS, MAX_COLORS + 1):
+        for hi in range(hs):
+            for si in range(ss):
+                row[n - MIN_COLORS, hi, si] = encode(generate_palette(base_hex, name, n, hi / (STEPS - 1), si / (STEPS - 1)))
+    return row
+
+@functools.lru_cache(maxsize=None)
+def rules_digest(names):
+    # Each style's palettes for a few bases at the grid's corners and middle
+    digest = hashlib.sha1()
+    for name in names:
+        for base_hex in PROBE_BASES:
+            for n in (MIN_COLORS, 8, MAX_COLORS):
+                for v in (0.0, 0.5, 1.0):
+                    digest.update(name.encode('utf-8') + encode(generate_palette(base_hex, name, n, v, 1.0 - v)).tobytes())
+    return digest.hexdigest()
+
+def _build_rows(args):
+    names, hexes = args
+    return {name: np.stack([build_row(name, h) for h in hexes]) for name in names}
+
+class MaterializedTable:
+    """
+    Memory-mapped palette table. lookup() is a dict hit for the base color
+    row plus one array index; refresh() appends rows for colors the table
+    hasn't seen, leaving existing rows untouched.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.rows = {}
+        self.tables = {}
+        self.load()
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    @contextmanager
+    def _locked(self):
+        # Thread lock for this process, file lock across processes
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, LOCK_FILE), 'a') as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+    def _manifest_mtime(self):
+        try:
+            return os.stat(os.path.join(self.directory, 'manifest.json')).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload_if_changed(self):
+        # Picks up a table rebuilt or extended by another process (materialize.py --add)
+        if self._manifest_mtime() != self.mtime:
+            with self.lock:
+                if self._manifest_mtime() != self.mtime:
+                    self.load()
+
+    def load(self):
+        self.mtime = self._manifest_mtime()  # before reading, so a write in between triggers another reload
+        try:
+            with open(os.path.join(self.directory, 'manifest.json')) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {'hexes': [], 'styles': []}
+        self.styles = [s for s in manifest['styles'] if s in STYLE_REGISTRY]
+        # Built from older style rules (or before digests were recorded): serve nothing
+        self.stale = bool(manifest['hexes']) and manifest.get('rules_digest') != rules_digest(tuple(self.styles))
+        if self.stale:
+            manifest['hexes'], self.styles = [], []
+        self.hexes = manifest['hexes']
+        self.rows = {h: i for i, h in enumerate(self.hexes)}
+        self.tables = {}
+        if not self.hexes:
+            return
+        for name in self.styles:
+            try:
+                self.tables[name] = np.memmap(self._path(name), dtype=np.uint32, mode='r',
+                                              shape=(len(self.hexes),) + row_shape(name))
+            except (OSError, ValueError):
+                continue  # Missing or short file: that style falls back to computing
+
+    def lookup(self, style, base_hex, num_colors, hue_shift=0.1, saturation_boost=0.5):
+        """
+        The stored palette, or None when the style, base color or slider
+        values are not in the table.
+        """
+        table = self.tables.get(style)
+        row = self.rows.get(base_hex.upper())
+        # row >= len(table) when a concurrent refresh swapped in new rows first
+        if table is None or row is None or row >= len(table) or not MIN_COLORS <= num_colors <= MAX_COLORS:
+            return None
+        hs, ss = style_grid(style)
+        hi = grid_index(hue_shift) if hs > 1 else 0
+        si = grid_index(saturation_boost) if ss > 1 else 0
+        if hi is None or si is None:
+            return None
+        return decode(table[row, num_colors - MIN_COLORS, hi, si])
+
+    def _write(self, hexes, blocks):
+        # Call with _locked() held. blocks may be a lazy iterator; each is
+        # written as soon as it arrives. Bytes past the manifest's rows (left
+        # by a writer that died before updating it) are cut off first.
+        files = {name: open(self._path(name), 'ab') for name in self.styles}
+        try:
+            for name, f in files.items():
+                f.truncate(len(self.hexes) * int(np.prod(row_shape(name))) * 4)
+            for block in blocks:
+                for name, f in files.items():
+                    f.write(np.ascontiguousarray(block[name]).tobytes())
+        finally:
+            for f in files.values():
+                f.close()
+        manifest = {'hexes': self.hexes + hexes, 'styles': self.styles, 'step': STEP,
+                    'num_colors': [MIN_COLORS, MAX_COLORS], 'rules_digest': rules_digest(tuple(self.styles))}
+        tmp = os.path.join(self.directory, 'manifest.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(self.directory, 'manifest.json'))
+        self.load()
+
+    def refresh(self, hexes):
+        # Append rows for base colors not in the table yet; returns how many were added
+        with self._locked():
+            self.load()  # another process may have appended since we last looked
+            if not self.styles:
+                return 0
+            fresh = list(dict.fromkeys(h.upper() for h in hexes if h.upper() not in self.rows))
+            if fresh:
+                self._write(fresh, [_build_rows((self.styles, fresh))])
+            return len(fresh)
+
+def build(directory=DEFAULT_DIR, colors=COLORS, max_bytes=DEFAULT_MAX_BYTES, jobs=1, chunk=16):
+    # Rebuild every table from scratch
+    hexes = list(dict.fromkeys(c['hex'].upper() for c in colors))
+    names = table_styles(max_bytes, len(hexes))
+    table = MaterializedTable(directory)
+    with table._locked():
+        for entry in os.listdir(directory):
+            if entry == 'manifest.json' or entry.endswith('.bin'):
+                os.remove(os.path.join(directory, entry))
+        table.load()
+        table.styles = names
+        work = [(names, hexes[i:i + chunk]) for i in range(0, len(hexes), chunk)]
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            table._write(hexes, pool.map(_build_rows, work))
+    return table
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Materialize deterministic palette styles over the slider grid')
+    parser.add_argument('--output', default=DEFAULT_DIR)
+    parser.add_argument('--max-bytes', type=int, default=DEFAULT_MAX_BYTES, help='skip styles whose table is larger; 0 = no limit')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--add', nargs='+', metavar='HEX', help='append rows for these base colors instead of rebuilding')
+    args = parser.parse_args(argv)
+
+    if args.add:
+        table = MaterializedTable(args.output)
+        if table.stale:
+            print(f"{args.output} was built from older style rules; rebuild it without --add", file=sys.stderr)
+            return 1
+        added = table.refresh(args.add)
+        print(f"Added {added} base colors, {len(table.hexes)} in {args.output}")
+        return 0
+    table = build(args.output, COLORS, args.max_bytes, args.jobs)
+    skipped = [n for n, e in STYLE_REGISTRY.items() if e['cacheable'] and n not in table.styles]
+    size = sum(os.path.getsize(table._path(n)) for n in table.styles)
+    print(f"{len(table.hexes)} base colors, {len(table.styles)} styles, {size / 1e6:.1f} MB in {args.output}")
+    if skipped:
+        print(f"Over the size limit, left to the cache: {', '.join(skipped)}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
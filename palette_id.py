@@ -0,0 +1,83 @@
+# palette_id.py - Content-addressed palette IDs and compact share tokens
+#
+# A token is the base64url (unpadded) encoding of:
+#   version:u8  flags:u8  count:u16  num_colors:u16  base:3 bytes
+#   hue_shift:u16  saturation_boost:u16  (both x 10000)  [seed:u32]
+#   style_len:u8  style:utf-8  colors:3 bytes each
+# flags bit 0 = seed present, bits 1-2 = index into GENERATION_SPACES.
+# Colors travel as packed 24-bit RGB, so restoring a palette never reruns a style.
+import base64
+import hashlib
+import struct
+
+from colorspace import hex_to_rgb_array, rgb_array_to_hex
+from utils import GENERATION_SPACES
+
+VERSION = 1
+_HEADER = struct.Struct('<BBHH3sHH')
+_SEED = struct.Struct('<I')
+PARAM_SCALE = 10000
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def unb64url(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def palette_id(palette):
+    # Stable ID from the colors alone: 96 bits of SHA-256 over packed RGB, 16 characters
+    return b64url(hashlib.sha256(hex_to_rgb_array(palette).tobytes()).digest()[:12])
+
+def encode_state(palette, style, base_hex, num_colors, hue_shift=0.1, saturation_boost=0.5, space='hsl', seed=None):
+    style_bytes = style.encode('utf-8')
+    if len(style_bytes) > 255:
+        raise ValueError("Style name too long to encode")
+    flags = (seed is not None) | (GENERATION_SPACES.index(space) << 1)
+    parts = [_HEADER.pack(
+        VERSION, flags, len(palette), num_colors, hex_to_rgb_array([base_hex]).tobytes(),
+        round(hue_shift * PARAM_SCALE), round(saturation_boost * PARAM_SCALE),
+    )]
+    if seed is not None:
+        parts.append(_SEED.pack(seed & 0xFFFFFFFF))
+    parts += [bytes([len(style_bytes)]), style_bytes, hex_to_rgb_array(palette).tobytes()]
+    return b64url(b''.join(parts))
+
+def decode_state(token):
+    """
+    Inverse of encode_state. Returns a dict with palette, style, base_hex,
+    num_colors, hue_shift, saturation_boost, space, seed and id; raises
+    ValueError on anything malformed.
+    """
+    try:
+        data = unb64url(token)
+        version, flags, count, num_colors, base, hue, sat = _HEADER.unpack_from(data)
+        if version != VERSION:
+            raise ValueError(f"Unsupported palette token version {version}")
+        offset = _HEADER.size
+        seed = None
+        if flags & 1:
+            seed = _SEED.unpack_from(data, offset)[0]
+            offset += _SEED.size
+        style_len = data[offset]
+        style = data[offset + 1:offset + 1 + style_len].decode('utf-8')
+        offset += 1 + style_len
+        colors = data[offset:]
+        if len(colors) != 3 * count:
+            raise ValueError("Palette token length mismatch")
+        space = GENERATION_SPACES[flags >> 1]
+        if hue > PARAM_SCALE or sat > PARAM_SCALE:
+            raise ValueError("Slider value out of range")
+    except (struct.error, IndexError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid palette token: {e}") from None
+    palette = [h.upper() for h in rgb_array_to_hex(list(colors))]
+    return {
+        'palette': palette,
+        'style': style,
+        'base_hex': rgb_array_to_hex(list(base))[0].upper(),
+        'num_colors': num_colors,
+        'hue_shift': hue / PARAM_SCALE,
+        'saturation_boost': sat / PARAM_SCALE,
+        'space': space,
+        'seed': seed,
+        'id': palette_id(palette),
+    }
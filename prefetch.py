@@ -0,0 +1,149 @@
+# prefetch.py - Speculative prefetch of neighboring slider states into the shared cache
+#
+# After a render, the app schedules tasks for the states one slider step (or
+# one style) away. Workers write results at PRIORITY_LOW, so unused prefetches
+# are evicted first. Each session has its own generation: scheduling again
+# cancels that session's unstarted tasks, and running ones stop at their next
+# fetch. A result counts as a hit when the app later claims its key, and as
+# wasted work when it ages out of the tracking window unclaimed.
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import profiler
+from shared_cache import PRIORITY_LOW, PRIORITY_NORMAL
+from utils import STYLE_REGISTRY
+
+STEP = 0.05
+MIN_COLORS, MAX_COLORS = 3, 20
+WORKERS = 2
+TRACKED = 1024  # prefetched keys remembered for hit/waste accounting
+
+def neighbor_states(style, num_colors, hue_shift, saturation_boost, styles):
+    """
+    (style, num_colors, hue_shift, saturation_boost) one step from the
+    current state, most likely first: sliders the style reads, then the
+    previous and next cacheable style in styles.
+    """
+    params = STYLE_REGISTRY[style]['params'] if style in STYLE_REGISTRY else {}
+    out = []
+    for n in (num_colors + 1, num_colors - 1):
+        if MIN_COLORS <= n <= MAX_COLORS:
+            out.append((style, n, hue_shift, saturation_boost))
+    for delta in (STEP, -STEP):
+        h, s = round(hue_shift + delta, 4), round(saturation_boost + delta, 4)
+        if 'hue_shift' in params and 0 <= h <= 1:
+            out.append((style, num_colors, h, saturation_boost))
+        if 'saturation_boost' in params and 0 <= s <= 1:
+            out.append((style, num_colors, hue_shift, s))
+    if style in styles:
+        i = styles.index(style)
+        for other in (styles[(i + 1) % len(styles)], styles[i - 1]):
+            entry = STYLE_REGISTRY.get(other)
+            if other != style and entry is not None and entry['cacheable']:
+                out.append((other, num_colors, hue_shift, saturation_boost))
+    return list(dict.fromkeys(out))
+
+class Cancelled(Exception):
+    pass
+
+class Prefetcher:
+    """
+    Thread pool shared by every session. A task is a callable taking
+    fetch(key, compute), which returns the cached bytes for key, computing
+    and storing them at low priority on a miss, and raises Cancelled once
+    the session has moved on.
+    """
+
+    def __init__(self, cache, workers=WORKERS, tracked=TRACKED):
+        self.cache = cache
+        self.tracked = tracked
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self.lock = threading.Lock()
+        self.sessions = {}          # session -> (generation, futures)
+        self.produced = OrderedDict()  # key -> seconds spent computing it
+        self.generation = 0
+
+    def schedule(self, session, tasks):
+        with self.lock:
+            self._cancel(session)
+            self.generation += 1
+            generation = self.generation
+            # Registered before submitting, so workers see their generation as live
+            futures = []
+            self.sessions[session] = (generation, futures)
+            futures += [self.pool.submit(self._run, session, generation, task) for task in tasks]
+            if len(self.sessions) > 256:
+                for sid in [s for s, (_, fs) in self.sessions.items() if all(f.done() for f in fs)]:
+                    del self.sessions[sid]
+        profiler.count('prefetch.scheduled', len(tasks))
+
+    def cancel(self, session):
+        with self.lock:
+            self._cancel(session)
+
+    def _cancel(self, session):
+        _, futures = self.sessions.pop(session, (None, []))
+        cancelled = sum(f.cancel() for f in futures)
+        if cancelled:
+            profiler.count('prefetch.cancelled', cancelled)
+
+    def _live(self, session, generation):
+        entry = self.sessions.get(session)
+        return entry is not None and entry[0] == generation
+
+    def _run(self, session, generation, task):
+        def fetch(key, compute):
+            if not self._live(session, generation):
+                raise Cancelled()
+            start = time.perf_counter()
+            value, hit = self.cache.get_or_compute(key, compute, PRIORITY_LOW)
+            if not hit:
+                elapsed = time.perf_counter() - start
+                profiler.count('prefetch.computed')
+                profiler.record_time('prefetch.compute', elapsed)
+                self._track(key, elapsed)
+            return value
+        try:
+            task(fetch)
+        except Cancelled:
+            profiler.count('prefetch.cancelled')
+        except Exception:
+            profiler.count('prefetch.errors')
+
+    def _track(self, key, seconds):
+        with self.lock:
+            self.produced[key] = seconds
+            while len(self.produced) > self.tracked:
+                _, wasted = self.produced.popitem(last=False)
+                profiler.count('prefetch.wasted')
+                profiler.record_time('prefetch.wasted', wasted)
+
+    def claim(self, key):
+        """
+        Called when the app serves key. A prefetched key counts as a hit and
+        is rewritten at normal priority now that someone has used it.
+        """
+        with self.lock:
+            seconds = self.produced.pop(key, None)
+        if seconds is None:
+            return False
+        profiler.count('prefetch.hits')
+        profiler.record_time('prefetch.saved', seconds)
+        value = self.cache.get(key)
+        if value is not None:
+            self.cache.set(key, value, PRIORITY_NORMAL)
+        return True
+
+    def stats(self):
+        counters = profiler.snapshot()['counters']
+        hits, computed = counters.get('prefetch.hits', 0), counters.get('prefetch.computed', 0)
+        return {
+            'scheduled': counters.get('prefetch.scheduled', 0),
+            'computed': computed,
+            'hits': hits,
+            'wasted': counters.get('prefetch.wasted', 0),
+            'cancelled': counters.get('prefetch.cancelled', 0),
+            'hit_rate': hits / computed if computed else 0.0,
+        }
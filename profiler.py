@@ -0,0 +1,96 @@
+# profiler.py - Lightweight timers, counters and gauges for app.py reruns
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Process-wide metrics, shared by every session so dashboards see the whole worker
+_lock = threading.Lock()
+_timers = {}    # name -> [calls, total_seconds, max_seconds, last_seconds]
+_counters = {}  # name -> int
+_gauges = {}    # name -> float
+
+@contextmanager
+def timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_time(name, time.perf_counter() - start)
+
+def timed(name):
+    # Decorator form of timer()
+    def wrap(func):
+        def inner(*args, **kwargs):
+            with timer(name):
+                return func(*args, **kwargs)
+        inner.__name__ = func.__name__
+        inner.__doc__ = func.__doc__
+        return inner
+    return wrap
+
+def record_time(name, seconds):
+    with _lock:
+        entry = _timers.get(name)
+        if entry is None:
+            _timers[name] = [1, seconds, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3] = seconds
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def gauge(name, value):
+    with _lock:
+        _gauges[name] = float(value)
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _gauges.clear()
+
+def snapshot():
+    """
+    Return a plain-dict copy of all metrics, safe to serialize.
+    """
+    with _lock:
+        timers = {
+            name: {'calls': e[0], 'total_s': e[1], 'mean_s': e[1] / e[0], 'max_s': e[2], 'last_s': e[3]}
+            for name, e in _timers.items()
+        }
+        return {'timers': timers, 'counters': dict(_counters), 'gauges': dict(_gauges)}
+
+def to_json(indent=None):
+    return json.dumps(snapshot(), indent=indent, sort_keys=True)
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def to_prometheus(prefix='palette'):
+    """
+    Render metrics in the Prometheus text exposition format.
+    Metric names stay fixed; the dotted metric name goes into a "name" label.
+    """
+    snap = snapshot()
+    lines = []
+    families = [
+        ('timer_calls_total', 'counter', 'Number of timed calls', {k: v['calls'] for k, v in snap['timers'].items()}),
+        ('timer_seconds_total', 'counter', 'Total seconds spent', {k: v['total_s'] for k, v in snap['timers'].items()}),
+        ('timer_seconds_max', 'gauge', 'Slowest single call in seconds', {k: v['max_s'] for k, v in snap['timers'].items()}),
+        ('events_total', 'counter', 'Event counters', snap['counters']),
+        ('value', 'gauge', 'Last observed values', snap['gauges']),
+    ]
+    for suffix, kind, help_text, values in families:
+        if not values:
+            continue
+        metric = f"{prefix}_{suffix}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name in sorted(values):
+            lines.append(f'{metric}{{name="{_label(name)}"}} {values[name]}')
+    return "\n".join(lines) + "\n"
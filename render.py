@@ -0,0 +1,243 @@
+# render.py - Palette renderers for every display style (no Streamlit dependency)
+import base64
+import hashlib
+import io
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle, Polygon, Rectangle
+
+from colormap import ramp, to_css_stops
+
+DISPLAY_STYLES = [
+    'rectangle_bars', 'hexagon_grid', 'spiral_swirl', 'color_wheel',
+    'rainbow_arc', 'chevron', 'circles', 'squares', 'gradient_strip',
+    'zigzag', 'waves', 'dots', 'tiles', '3d_cube'
+]
+
+def _default_name(hex_str, default="Generated"):
+    return default
+
+# Convert hex to RGB for Matplotlib
+def hex_to_rgb_mpl(hex_str):
+    hex_str = hex_str.lstrip('#')
+    return tuple(int(hex_str[i:i+2], 16) / 255.0 for i in (0, 2, 4))
+
+# Matplotlib rendering functions. These build Figure objects directly with an
+# Agg canvas instead of going through pyplot, whose global figure manager is
+# not thread-safe; each call owns its figure, so sessions can render concurrently.
+def _subplots(figsize):
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+def render_rainbow_arc(palette):
+    fig, ax = _subplots(figsize=(6, 3))
+    for i, color in enumerate(palette):
+        ax.add_patch(Rectangle((i * 0.2, 0), 0.2, 1, color=hex_to_rgb_mpl(color)))
+    ax.set_xlim(0, len(palette) * 0.2)
+    ax.set_ylim(0, 1)
+    ax.axis('off')
+    return fig
+
+def render_hexagon_grid(palette):
+    fig, ax = _subplots(figsize=(6, 6))
+    for i, color in enumerate(palette):
+        row = i // 5
+        col = i % 5
+        hexagon = Polygon([
+            (col + 0.5, row + 0.866), (col + 1, row + 0.5), (col + 1, row),
+            (col + 0.5, row - 0.866), (col, row - 0.5), (col, row)
+        ], facecolor=hex_to_rgb_mpl(color))
+        ax.add_patch(hexagon)
+    ax.set_xlim(-0.5, 5.5)
+    ax.set_ylim(-1, len(palette) // 5 + 1)
+    ax.axis('off')
+    return fig
+
+def render_spiral_swirl(palette):
+    fig, ax = _subplots(figsize=(6, 6))
+    for i, color in enumerate(palette):
+        angle = i * 137.5 * np.pi / 180  # Golden angle
+        radius = 0.5 * np.sqrt(i + 1)
+        x = 3 + radius * np.cos(angle)
+        y = 3 + radius * np.sin(angle)
+        ax.add_patch(Circle((x, y), 0.3, color=hex_to_rgb_mpl(color)))
+    ax.set_xlim(0, 6)
+    ax.set_ylim(0, 6)
+    ax.axis('off')
+    return fig
+
+def render_color_wheel(palette):
+    fig, ax = _subplots(figsize=(6, 6))
+    for i, color in enumerate(palette):
+        angle = i * 2 * np.pi / len(palette)
+        x = 3 + 2 * np.cos(angle)
+        y = 3 + 2 * np.sin(angle)
+        ax.add_patch(Circle((x, y), 0.5, color=hex_to_rgb_mpl(color)))
+    ax.set_xlim(0, 6)
+    ax.set_ylim(0, 6)
+    ax.axis('off')
+    return fig
+
+# HTML cell renderers, one st.columns cell per color
+def rectangle_bar_cell(color, name_of=_default_name):
+    name = name_of(color)
+    return f"<div class='palette-box' style='background:{color}; height:150px; text-align:center; color:white; padding:10px;'><b>{name}</b><br>{color}<br><button class='copy-hex' onclick='copyToClipboard(\"{color}\")'>Copy</button></div>"
+
+def square_cell(color, name_of=_default_name):
+    name = name_of(color)
+    return f"<div class='palette-box' style='background:{color}; width:100px; height:100px; text-align:center; color:white; padding:10px; font-size:10px;'><b>{name}</b><br>{color}</div>"
+
+def circle_cell(color, name_of=_default_name):
+    name = name_of(color, "Gen")
+    return f"<div class='palette-box' style='background:{color}; width:100px; height:100px; border-radius:50%; text-align:center; color:white; padding:30px 5px; font-size:9px;'><b>{name}</b><br>{color}</div>"
+
+# HTML block renderers, one markdown block per palette
+def tiles_html(palette, name_of=_default_name):
+    html = "<div style='display:grid; grid-template-columns: repeat(auto-fill, minmax(80px, 1fr)); gap:5px;'>"
+    for color in palette:
+        name = name_of(color, "Gen")
+        html += f"<div class='palette-box' style='background:{color}; width:80px; height:80px; color:white; padding:5px; font-size:10px;'><b>{name}</b><br>{color}</div>"
+    html += "</div>"
+    return html
+
+def chevron_html(palette, name_of=_default_name):
+    html = "<div style='display:flex; height:200px;'>"
+    for i, color in enumerate(palette):
+        offset = (i % 2) * 20
+        html += f"<div style='background:{color}; flex:1; clip-path:polygon(0 {offset}px, 100% {offset+20}px, 100% calc(100% - {offset}px), 0 calc(100% - {offset+20}px)); margin:0 -5px;'></div>"
+    html += "</div>"
+    return html
+
+def gradient_strip_html(palette, name_of=_default_name):
+    # Interpolate in OKLab; CSS would blend the stops in sRGB and muddy the midpoints
+    gradient = to_css_stops(ramp(palette, 256, monotone=False, spacing='even'))
+    return f"<div style='height:150px; background: {gradient}; border-radius:10px;'></div>"
+
+def zigzag_html(palette, name_of=_default_name):
+    html = "<div style='display:flex; height:200px;'>"
+    for i, color in enumerate(palette):
+        points = "0 50%, 50% 0, 100% 50%, 50% 100%" if i % 2 == 0 else "0 0, 100% 0, 100% 100%, 0 100%"
+        html += f"<div style='background:{color}; flex:1; clip-path:polygon({points});'></div>"
+    html += "</div>"
+    return html
+
+def waves_html(palette, name_of=_default_name):
+    html = "<div style='position:relative; height:200px; overflow:hidden;'>"
+    for i, color in enumerate(palette):
+        offset = i * 30
+        html += f"<div style='position:absolute; width:100%; height:50px; background:{color}; top:{offset}px; border-radius:50%;'></div>"
+    html += "</div>"
+    return html
+
+def dots_html(palette, name_of=_default_name):
+    html = "<div style='display:flex; flex-wrap:wrap; gap:10px; justify-content:center; padding:20px;'>"
+    for color in palette:
+        html += f"<div style='background:{color}; width:60px; height:60px; border-radius:50%;'></div>"
+    html += "</div>"
+    return html
+
+def cube_html(palette, name_of=_default_name):
+    html = "<div style='display:grid; grid-template-columns:repeat(3, 1fr); gap:5px; perspective:400px;'>"
+    for i, color in enumerate(palette):
+        rotation = f"rotateY({i*15}deg)"
+        html += f"<div style='background:{color}; height:80px; transform:{rotation}; box-shadow:0 4px 8px rgba(0,0,0,0.3);'></div>"
+    html += "</div>"
+    return html
+
+MPL_RENDERERS = {
+    'rainbow_arc': render_rainbow_arc,
+    'hexagon_grid': render_hexagon_grid,
+    'spiral_swirl': render_spiral_swirl,
+    'color_wheel': render_color_wheel,
+}
+
+CELL_RENDERERS = {
+    'rectangle_bars': rectangle_bar_cell,
+    'squares': square_cell,
+    'circles': circle_cell,
+}
+
+HTML_RENDERERS = {
+    'tiles': tiles_html,
+    'chevron': chevron_html,
+    'gradient_strip': gradient_strip_html,
+    'zigzag': zigzag_html,
+    'waves': waves_html,
+    'dots': dots_html,
+    '3d_cube': cube_html,
+}
+
+PREVIEW_DPI = 200  # st.pyplot's savefig default
+
+def render_png(display_style, palette, dpi=PREVIEW_DPI):
+    # Rasterize a Matplotlib display style to PNG bytes, as st.pyplot would.
+    # The figure is never registered with pyplot, so there is nothing to close.
+    fig = MPL_RENDERERS[display_style](palette)
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
+    return buf.getvalue()
+
+def render_rgba(display_style, palette, dpi=100):
+    # Raw (H, W, 4) uint8 pixels, for pixel-exact comparisons
+    fig = MPL_RENDERERS[display_style](palette)
+    fig.set_dpi(dpi)
+    fig.canvas.draw()
+    return np.asarray(fig.canvas.buffer_rgba()).copy()
+
+# Large palettes: drawn client-side on a canvas from packed RGB bytes, so the
+# page carries 4 base64 characters per color instead of a DOM node per color
+CANVAS_MODES = ('grid', 'wheel', 'spiral', 'strip')
+
+_CANVAS_TEMPLATE = """
+<canvas id="%(id)s" style="width:100%%; height:%(height)dpx;"></canvas>
+<script>
+(function () {
+  const raw = atob("%(data)s");
+  const n = raw.length / 3;
+  const canvas = document.getElementById("%(id)s");
+  const w = canvas.clientWidth, h = %(height)d, dpr = window.devicePixelRatio || 1;
+  canvas.width = w * dpr;
+  canvas.height = h * dpr;
+  const ctx = canvas.getContext("2d");
+  ctx.scale(dpr, dpr);
+  const color = i => "rgb(" + raw.charCodeAt(3 * i) + "," + raw.charCodeAt(3 * i + 1) + "," + raw.charCodeAt(3 * i + 2) + ")";
+  const cx = w / 2, cy = h / 2, radius = Math.min(w, h) / 2 - 4;
+  const mode = "%(mode)s";
+  for (let i = 0; i < n; i++) {
+    ctx.fillStyle = color(i);
+    if (mode === "strip") {
+      ctx.fillRect(i * w / n, 0, w / n + 1, h);
+    } else if (mode === "wheel") {
+      const a0 = i / n * 2 * Math.PI, a1 = (i + 1.5) / n * 2 * Math.PI;
+      ctx.beginPath();
+      ctx.moveTo(cx, cy);
+      ctx.arc(cx, cy, radius, a0, a1);
+      ctx.fill();
+    } else if (mode === "spiral") {
+      // Sunflower layout: golden-angle steps, equal area per color
+      const r = radius * Math.sqrt((i + 0.5) / n), a = i * 2.399963229728653;
+      ctx.beginPath();
+      ctx.arc(cx + r * Math.cos(a), cy + r * Math.sin(a), Math.max(1, radius * Math.sqrt(1 / n)), 0, 2 * Math.PI);
+      ctx.fill();
+    } else {
+      const cols = Math.ceil(Math.sqrt(n * w / h)), size = Math.min(w / cols, h / Math.ceil(n / cols));
+      ctx.fillRect((i %% cols) * size, Math.floor(i / cols) * size, Math.ceil(size), Math.ceil(size));
+    }
+  }
+})();
+</script>
+"""
+
+def canvas_html(rgb, mode='grid', height=400):
+    # rgb: (N, 3) uint8 array or raw RGB bytes
+    if mode not in CANVAS_MODES:
+        raise ValueError(f"Unknown canvas mode: {mode}")
+    data = rgb if isinstance(rgb, bytes) else np.ascontiguousarray(rgb, dtype=np.uint8).tobytes()
+    # The page may hold several canvases; name this one after its content
+    canvas_id = 'palette-' + hashlib.sha1(data + mode.encode('ascii')).hexdigest()[:12]
+    return _CANVAS_TEMPLATE % {
+        'id': canvas_id, 'data': base64.b64encode(data).decode('ascii'), 'mode': mode, 'height': height,
+    }
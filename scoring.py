@@ -0,0 +1,103 @@
+# scoring.py - Vectorized palette quality scores and best-of-N generation
+import time
+from contextlib import nullcontext
+
+import numpy as np
+
+from colorspace import hex_to_rgb_array, rgb_array_to_hex, rgb_to_cielab, srgb_to_linear
+from utils import STYLE_REGISTRY, generate_palette, hls_array_to_uint8, seeded_random, working_space
+
+# Score = weighted sum of terms in [0, 1]; out_of_range is a penalty
+WEIGHTS = {'contrast': 1.0, 'min_delta_e': 1.5, 'lightness_range': 1.0, 'out_of_range': 2.0}
+DELTA_E_TARGET = 20.0  # min pairwise CIE76 ΔE that earns the full term
+BATCH = 64
+BUDGET_S = 0.05
+
+def score_palettes(rgb, hls=None, weights=WEIGHTS):
+    """
+    Score a (count, n, 3) uint8 batch of equal-length palettes at once.
+    hls, if given, holds the raw (count, n, 3) colorsys triples the colors
+    came from; components outside [0, 1] count against the palette.
+    Returns a dict of (count,) arrays: each term and the total 'score'.
+    """
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    count, n = rgb.shape[:2]
+    lab = rgb_to_cielab(rgb)
+    if n > 1:
+        d = np.sqrt(((lab[:, :, None, :] - lab[:, None, :, :]) ** 2).sum(axis=-1))
+        d[:, np.arange(n), np.arange(n)] = np.inf
+        min_de = d.min(axis=(1, 2))
+    else:
+        min_de = np.zeros(count)
+    # WCAG contrast ratio between the darkest and lightest color, log-scaled to [0, 1]
+    lum = srgb_to_linear(rgb) @ np.array([0.2126, 0.7152, 0.0722])
+    ratio = (lum.max(axis=1) + 0.05) / (lum.min(axis=1) + 0.05)
+    terms = {
+        'contrast': np.log(ratio) / np.log(21.0),
+        'min_delta_e': np.minimum(min_de / DELTA_E_TARGET, 1.0),
+        'lightness_range': np.ptp(lab[..., 0], axis=1) / 100.0,
+        'out_of_range': np.zeros(count) if hls is None else
+            ((np.asarray(hls) < 0) | (np.asarray(hls) > 1))[..., 1:].any(axis=-1).mean(axis=1),
+    }
+    terms['score'] = (
+        weights['contrast'] * terms['contrast']
+        + weights['min_delta_e'] * terms['min_delta_e']
+        + weights['lightness_range'] * terms['lightness_range']
+        - weights['out_of_range'] * terms['out_of_range']
+    )
+    return terms
+
+def _draw(style, base_hex, num_colors, hue_shift, saturation_boost, count, rng):
+    # One batch of candidates as [(palettes, rgb, hls)] groups of equal length
+    batch = style['vectorized']
+    if batch is not None:
+        groups = []
+        for head, hls in batch(base_hex, num_colors, hue_shift, saturation_boost, count, rng):
+            tail = hls_array_to_uint8(hls)
+            hexes = rgb_array_to_hex(tail)
+            width = tail.shape[1]
+            palettes = [head + hexes[i * width:(i + 1) * width] for i in range(len(tail))]
+            if head:
+                head_rgb = np.broadcast_to(hex_to_rgb_array(head), (len(tail), len(head), 3))
+                tail = np.concatenate([head_rgb, tail], axis=1)
+                # The base color is kept verbatim, so it is never out of range
+                hls = np.concatenate([np.full(head_rgb.shape, 0.5), hls], axis=1)
+            groups.append((palettes, tail, hls))
+        return groups
+    # No batch implementation: call the style once per candidate
+    by_len = {}
+    for _ in range(count):
+        palette = style['func'](base_hex, num_colors, hue_shift, saturation_boost)
+        by_len.setdefault(len(palette), []).append(palette)
+    return [(ps, hex_to_rgb_array([c for p in ps for c in p]).reshape(len(ps), -1, 3), None) for ps in by_len.values() if ps[0]]
+
+def best_of_n(base_hex, style='warm', num_colors=5, hue_shift=0.1, saturation_boost=0.5,
+              n=256, k=1, budget_s=BUDGET_S, seed=None, weights=WEIGHTS, space='hsl'):
+    """
+    Draw up to n candidate palettes in batches of BATCH, score them all and
+    return the top k as (palette, score) pairs, best first. Drawing stops
+    early once budget_s has elapsed (at least one batch is always drawn).
+    Unknown styles fall back to a single generate_palette draw.
+    """
+    entry = STYLE_REGISTRY.get(style)
+    if entry is None:
+        return [(generate_palette(base_hex, style, num_colors, hue_shift, saturation_boost, space, seed), 0.0)]
+    base_hex = base_hex.upper()
+    rng = np.random.default_rng(seed)
+    deadline = time.perf_counter() + budget_s
+    scored = []
+    drawn = 0
+    # Per-candidate styles draw from a private seeded stream, as generate_palette(seed=...) does
+    with seeded_random(seed) if seed is not None else nullcontext():
+        while drawn < n:
+            count = min(BATCH, n - drawn)
+            with working_space(space):
+                groups = _draw(entry, base_hex, num_colors, hue_shift, saturation_boost, count, rng)
+            for palettes, rgb, hls in groups:
+                scores = score_palettes(rgb, hls, weights)['score']
+                scored.extend(zip(scores.tolist(), palettes))
+            drawn += count
+            if time.perf_counter() > deadline:
+                break
+    scored.sort(key=lambda item: -item[0])
+    return [(palette, score) for score, palette in scored[:k]]
@@ -0,0 +1,264 @@
+# session_store.py - Bounded per-session state: packed palettes, delta undo/redo, spill to disk
+#
+# Colors are uint32 cells, 0xRRGGBB with bit 24 set when the hex was uppercase
+# (the same cell encoding as materialize.py), so a palette round-trips exactly.
+import os
+import struct
+import tempfile
+import threading
+import weakref
+from array import array
+from collections import deque
+
+import numpy as np
+
+UPPER = 1 << 24
+EMPTY = 0xFFFFFFFF
+MAX_BYTES = 64 * 1024       # in-memory saved palettes per session
+HISTORY_LIMIT = 100         # undo steps per session
+MAX_CUSTOM_COLORS = 1000
+INDEX_LIMIT = 1000          # palettes in the per-session similarity index
+SPILL_DIR = os.environ.get('PALETTE_SPILL_DIR') or None  # None = the system temp dir
+
+# Called as hook(kind, totals) after every change. totals holds the session
+# count and the summed memory_bytes and disk_bytes of every live object of
+# that kind, kept as running sums so a change costs O(1) however many
+# sessions are open.
+_usage_hook = None
+_live = weakref.WeakSet()  # entries vanish with their session
+_totals = {}               # kind -> {'sessions', 'memory_bytes_sum', 'disk_bytes_sum'}
+_live_lock = threading.Lock()
+
+def set_usage_hook(hook):
+    global _usage_hook
+    _usage_hook = hook
+
+def _register(obj):
+    # obj's share of the totals; finalize subtracts it when the session goes away
+    obj._accounted = [0, 0]
+    with _live_lock:
+        _live.add(obj)
+        totals = _totals.setdefault(obj.kind, {'sessions': 0, 'memory_bytes_sum': 0, 'disk_bytes_sum': 0})
+        totals['sessions'] += 1
+    weakref.finalize(obj, _release, obj.kind, obj._accounted)
+
+def _release(kind, accounted):
+    with _live_lock:
+        totals = _totals[kind]
+        totals['sessions'] -= 1
+        totals['memory_bytes_sum'] -= accounted[0]
+        totals['disk_bytes_sum'] -= accounted[1]
+
+def usage_totals(kind):
+    """
+    Running totals for one kind plus memory_bytes_max, the largest single
+    session. The max walks every live object, so it is meant for the
+    metrics panel rather than every change.
+    """
+    with _live_lock:
+        totals = dict(_totals.get(kind, {'sessions': 0, 'memory_bytes_sum': 0, 'disk_bytes_sum': 0}))
+        objs = [o for o in _live if o.kind == kind]
+    totals['memory_bytes_max'] = max((o.usage()['memory_bytes'] for o in objs), default=0)
+    return totals
+
+def _report(obj):
+    usage = obj.usage()
+    memory, disk = usage['memory_bytes'], usage.get('disk_bytes', 0)
+    with _live_lock:
+        totals = _totals[obj.kind]
+        totals['memory_bytes_sum'] += memory - obj._accounted[0]
+        totals['disk_bytes_sum'] += disk - obj._accounted[1]
+        obj._accounted[:] = [memory, disk]
+        totals = dict(totals)
+    if _usage_hook is not None:
+        _usage_hook(obj.kind, totals)
+
+def pack(palette):
+    return np.array([int(h.lstrip('#'), 16) | (UPPER if h != h.lower() else 0) for h in palette], dtype=np.uint32)
+
+def unpack(cells):
+    return [f"#{v & 0xFFFFFF:06X}" if v & UPPER else f"#{v & 0xFFFFFF:06x}" for v in cells.tolist() if v != EMPTY]
+
+class PaletteStore:
+    """
+    Append-only list of palettes. The newest palettes live in one packed
+    buffer of at most max_bytes; when it fills, the older half is appended to
+    a per-session spill file and read back on demand. Behaves like the list
+    of hex lists it replaces.
+    """
+
+    kind = 'saved_palettes'
+
+    def __init__(self, palettes=(), max_bytes=MAX_BYTES, spill_dir=SPILL_DIR):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self._cells = bytearray()   # uint32 cells of the in-memory palettes, back to back
+        self._ends = array('I')     # end offset (in cells) of each in-memory palette
+        self._spill = None
+        self._spill_offsets = array('Q')  # byte offset of each spilled record
+        self._spill_bytes = 0  # kept here: usage() may run on another session's thread
+        self._lock = threading.RLock()  # the download thread reads while the script appends
+        _register(self)
+        for palette in palettes:
+            self.append(palette)
+
+    def __len__(self):
+        return len(self._spill_offsets) + len(self._ends)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("palette index out of range")
+        with self._lock:
+            spilled = len(self._spill_offsets)
+            if i < spilled:
+                return unpack(self._read_spilled(i))
+            i -= spilled
+            start = self._ends[i - 1] if i else 0
+            return unpack(np.frombuffer(self._cells, dtype=np.uint32, count=self._ends[i] - start, offset=4 * start))
+
+    def append(self, palette):
+        with self._lock:
+            self._cells += pack(palette).tobytes()
+            self._ends.append(len(self._cells) // 4)
+            if len(self._cells) > self.max_bytes and len(self._ends) > 1:
+                self._spill_oldest(len(self._ends) // 2)
+        _report(self)
+
+    def _spill_oldest(self, count):
+        # Records are u16 length + cells; the file goes away with the session
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile(prefix='palettes-', dir=self.spill_dir)
+        end = self._ends[count - 1]
+        records = []
+        start = 0
+        for i in range(count):
+            records.append(struct.pack('<H', self._ends[i] - start) + bytes(self._cells[4 * start:4 * self._ends[i]]))
+            start = self._ends[i]
+        self._spill.seek(self._spill_bytes)
+        for record in records:
+            self._spill_offsets.append(self._spill_bytes)
+            self._spill.write(record)
+            self._spill_bytes += len(record)
+        del self._cells[:4 * end]
+        self._ends = array('I', (e - end for e in self._ends[count:]))
+
+    def _read_spilled(self, i):
+        self._spill.seek(self._spill_offsets[i])
+        n = struct.unpack('<H', self._spill.read(2))[0]
+        return np.frombuffer(self._spill.read(4 * n), dtype=np.uint32)
+
+    def usage(self):
+        return {
+            'palettes': len(self),
+            'spilled': len(self._spill_offsets),
+            'memory_bytes': len(self._cells) + self._ends.itemsize * len(self._ends)
+                            + self._spill_offsets.itemsize * len(self._spill_offsets),
+            'disk_bytes': self._spill_bytes,
+        }
+
+class CustomColors:
+    """
+    Custom color entries as packed cells plus names, capped at limit.
+    Iterates as the {'name', 'hex', 'vibe', 'why_underrated'} dicts the
+    library expects.
+    """
+
+    kind = 'custom_colors'
+
+    def __init__(self, limit=MAX_CUSTOM_COLORS):
+        self.limit = limit
+        self.names = []
+        self._cells = array('I')
+        self._name_bytes = 0
+        _register(self)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        for name, cells in zip(self.names, np.frombuffer(self._cells, dtype=np.uint32).reshape(-1, 1)):
+            yield {'name': name, 'hex': unpack(cells)[0], 'vibe': 'Custom', 'why_underrated': 'User Creation'}
+
+    def append(self, entry):
+        if len(self) >= self.limit:
+            raise ValueError(f"Custom color limit reached ({self.limit})")
+        self.names.append(entry['name'])
+        self._name_bytes += len(entry['name'])
+        self._cells.append(int(pack([entry['hex']])[0]))
+        _report(self)
+
+    def usage(self):
+        return {'colors': len(self), 'memory_bytes': self._cells.itemsize * len(self._cells) + self._name_bytes}
+
+class PaletteHistory:
+    """
+    Undo/redo for the current palette. Each step stores only the positions
+    that changed, with their cells before and after, so rerolling one
+    swatch costs a few bytes. Keeps the last limit steps.
+    """
+
+    kind = 'palette_history'
+
+    def __init__(self, limit=HISTORY_LIMIT):
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = []
+        self._bytes = 0  # of every step in both stacks, so usage() is O(1)
+        _register(self)
+
+    @staticmethod
+    def _size(step):
+        return sum(a.nbytes for a in step)
+
+    def record(self, before, after):
+        if before == after:
+            return
+        old, new = pack(before or []), pack(after or [])
+        width = max(len(old), len(new))
+        old_cells = np.full(width, EMPTY, dtype=np.uint32)
+        new_cells = np.full(width, EMPTY, dtype=np.uint32)
+        old_cells[:len(old)] = old
+        new_cells[:len(new)] = new
+        changed = np.flatnonzero(old_cells != new_cells).astype(np.uint16)
+        if len(self.undo_stack) == self.undo_stack.maxlen:
+            self._bytes -= self._size(self.undo_stack[0])  # about to fall off the end
+        step = (changed, old_cells[changed], new_cells[changed])
+        self.undo_stack.append(step)
+        self._bytes += self._size(step) - sum(self._size(s) for s in self.redo_stack)
+        self.redo_stack.clear()
+        _report(self)
+
+    @staticmethod
+    def _apply(palette, changed, cells):
+        current = pack(palette or [])
+        width = max(len(current), int(changed[-1]) + 1)
+        out = np.full(width, EMPTY, dtype=np.uint32)
+        out[:len(current)] = current
+        out[changed] = cells
+        return unpack(out) or None
+
+    def undo(self, palette):
+        # Returns the previous palette, or palette itself with nothing to undo
+        if not self.undo_stack:
+            return palette
+        step = self.undo_stack.pop()
+        self.redo_stack.append(step)
+        return self._apply(palette, step[0], step[1])
+
+    def redo(self, palette):
+        if not self.redo_stack:
+            return palette
+        step = self.redo_stack.pop()
+        self.undo_stack.append(step)
+        return self._apply(palette, step[0], step[2])
+
+    def usage(self):
+        return {'steps': len(self.undo_stack) + len(self.redo_stack), 'memory_bytes': self._bytes}
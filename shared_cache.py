@@ -0,0 +1,306 @@
+# shared_cache.py - Content-addressed palette/preview cache shared across worker processes
+#
+# Backends store opaque bytes under string keys. The interface is deliberately
+# the subset of a Redis-like server the cache needs (GET, SET, SET NX with TTL,
+# DEL and a compare-and-delete script), so a networked backend can replace
+# SQLiteBackend without other changes.
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import profiler
+
+DEFAULT_PATH = os.environ.get('PALETTE_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'colorpallete_cache.sqlite'))
+DEFAULT_MAX_BYTES = int(os.environ.get('PALETTE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Eviction order: lower priority goes first, then least recently used
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+
+# SQLite access times are batched in memory and written at most this often
+# (or once this many keys are pending), so reads don't take the write lock
+TOUCH_INTERVAL = 1.0
+TOUCH_BATCH = 256
+
+def make_key(namespace, *parts):
+    """
+    Content-addressed key: a digest of the canonical JSON of the inputs, so
+    equal requests map to the same key in every process.
+    """
+    blob = json.dumps([namespace, *parts], sort_keys=True, separators=(',', ':'), default=str)
+    return f"{namespace}:{hashlib.sha256(blob.encode('utf-8')).hexdigest()}"
+
+class CacheBackend:
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, priority=PRIORITY_NORMAL):
+        raise NotImplementedError
+
+    def add(self, key, value, ttl):
+        # Store only if key is absent (or expired); True when stored. Used for leases.
+        raise NotImplementedError
+
+    def release(self, key, value):
+        # Delete key only if it still holds value (compare-and-delete)
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+class MemoryBackend(CacheBackend):
+    """
+    Size-bounded in-process backend. Useful for a single worker and as a
+    reference implementation of the backend contract.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (value, priority)
+        self.leases = {}
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            hit = self.entries.get(key)
+            if hit is None:
+                return None
+            self.entries.move_to_end(key)
+            return hit[0]
+
+    def set(self, key, value, priority=PRIORITY_NORMAL):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self.entries[key] = (value, priority)
+            self.size += len(value)
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and self.entries:
+            lowest = min(p for _, p in self.entries.values())
+            # Oldest entry of the lowest priority; OrderedDict keeps LRU order
+            victim = next(k for k, (_, p) in self.entries.items() if p == lowest)
+            self.size -= len(self.entries.pop(victim)[0])
+
+    def add(self, key, value, ttl):
+        with self.lock:
+            now = time.time()
+            current = self.leases.get(key)
+            if current is not None and current[1] > now:
+                return False
+            self.leases[key] = (value, now + ttl)
+            return True
+
+    def release(self, key, value):
+        with self.lock:
+            current = self.leases.get(key)
+            if current is not None and current[0] == value:
+                del self.leases[key]
+
+    def delete(self, key):
+        with self.lock:
+            self.leases.pop(key, None)
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+
+class SQLiteBackend(CacheBackend):
+    """
+    SQLite file shared by every process on the host. WAL mode lets readers
+    proceed while a writer commits; each thread gets its own connection.
+    The total size lives in the meta table and is updated in the same
+    transaction as every write, so set() never scans the entries.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.local = threading.local()
+        self.touch_lock = threading.Lock()
+        self.touched = {}  # key -> access time not yet written
+        self.flushed = time.monotonic()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, size INTEGER, priority INTEGER, accessed REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_evict ON entries (priority, accessed)")
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT, expires REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        with conn:
+            # Files from before the meta table get their total computed once
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR IGNORE INTO meta (name, value) SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM entries")
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self.touch_lock:
+            self.touched[key] = time.time()
+            due = len(self.touched) >= TOUCH_BATCH or time.monotonic() - self.flushed >= TOUCH_INTERVAL
+        if due:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                self._write_touches(conn)
+        return row[0]
+
+    def _write_touches(self, conn):
+        # Pending access times, written inside the caller's transaction
+        with self.touch_lock:
+            touched, self.touched = self.touched, {}
+            self.flushed = time.monotonic()
+        if touched:
+            conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?", [(t, k) for k, t in touched.items()])
+
+    def _adjust_total(self, conn, delta):
+        conn.execute("UPDATE meta SET value = value + ? WHERE name = 'total_bytes'", (delta,))
+
+    def set(self, key, value, priority=PRIORITY_NORMAL):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._write_touches(conn)
+            old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, priority, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), priority, time.time()),
+            )
+            self._adjust_total(conn, len(value) - (old[0] if old else 0))
+            total = conn.execute("SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+            freed = 0
+            while total > self.max_bytes:
+                victims = conn.execute(
+                    "SELECT key, size FROM entries WHERE key != ? ORDER BY priority, accessed LIMIT 64", (key,)
+                ).fetchall()
+                if not victims:
+                    break
+                for victim, size in victims:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (victim,))
+                    total -= size
+                    freed += size
+                    profiler.count('shared_cache.evictions')
+                    if total <= self.max_bytes:
+                        break
+            if freed:
+                self._adjust_total(conn, -freed)
+
+    def add(self, key, value, ttl):
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires <= ?", (key, now))
+            cur = conn.execute("INSERT OR IGNORE INTO leases (key, owner, expires) VALUES (?, ?, ?)", (key, value, now + ttl))
+            return cur.rowcount == 1
+
+    def delete(self, key):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if old:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._adjust_total(conn, -old[0])
+            conn.execute("DELETE FROM leases WHERE key = ?", (key,))
+
+    def release(self, key, value):
+        self._conn().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, value))
+
+class SharedCache:
+    """
+    get_or_compute with single-flight: threads in this process wait on an
+    Event, other processes wait on a lease in the backend, so concurrent
+    identical requests compute once.
+    """
+
+    def __init__(self, backend, lease_seconds=30.0, poll_seconds=0.01):
+        self.backend = backend
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.owner = uuid.uuid4().hex
+        self.inflight = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, priority=PRIORITY_NORMAL):
+        self.backend.set(key, value, priority)
+
+    def get_or_compute(self, key, compute, priority=PRIORITY_NORMAL):
+        """
+        Return the cached bytes for key, calling compute() (which must return
+        bytes) on a miss. Returns (value, hit).
+        """
+        value = self.backend.get(key)
+        if value is not None:
+            profiler.count('shared_cache.hits')
+            return value, True
+
+        with self.lock:
+            event = self.inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self.inflight[key] = threading.Event()
+        if not leader:
+            event.wait(self.lease_seconds)
+            value = self.backend.get(key)
+            if value is not None:
+                profiler.count('shared_cache.coalesced')
+                return value, True
+            return self.get_or_compute(key, compute, priority)
+
+        try:
+            deadline = time.monotonic() + self.lease_seconds
+            while not self.backend.add(f"lease:{key}", self.owner, self.lease_seconds):
+                # Another process is computing this key; wait for its result
+                value = self.backend.get(key)
+                if value is not None:
+                    profiler.count('shared_cache.coalesced')
+                    return value, True
+                if time.monotonic() > deadline:
+                    break
+                time.sleep(self.poll_seconds)
+            try:
+                value = self.backend.get(key)
+                if value is not None:
+                    return value, True
+                profiler.count('shared_cache.misses')
+                value = compute()
+                self.backend.set(key, value, priority)
+                return value, False
+            finally:
+                self.backend.release(f"lease:{key}", self.owner)
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+            event.set()
+
+    def get_or_compute_json(self, key, compute, priority=PRIORITY_NORMAL):
+        value, hit = self.get_or_compute(key, lambda: json.dumps(compute()).encode('utf-8'), priority)
+        return json.loads(value), hit
+
+def default_cache(path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+    # Fall back to a private in-memory cache where the SQLite file can't be opened
+    try:
+        backend = SQLiteBackend(path, max_bytes)
+    except sqlite3.Error:
+        backend = MemoryBackend(max_bytes)
+    return SharedCache(backend)
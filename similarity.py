@@ -0,0 +1,153 @@
+# similarity.py - Order-invariant palette embeddings and an incremental LSH nearest-neighbor index
+import numpy as np
+
+from colorspace import hex_to_rgb_array, rgb_to_oklab
+
+def _anchor_grid(steps=4):
+    # Soft-histogram bin centers: an even sRGB grid, mapped to OKLab
+    axis = (np.arange(steps) + 0.5) / steps
+    grid = np.stack(np.meshgrid(axis, axis, axis, indexing='ij'), axis=-1).reshape(-1, 3)
+    return rgb_to_oklab(grid)
+
+ANCHORS = _anchor_grid()
+SIGMA = 0.08  # OKLab distance at which a color's vote has fallen to ~60%
+
+def embed_palettes(palettes):
+    """
+    Embed palettes as L2-normalized soft color histograms over ANCHORS.
+    Every color votes for nearby bins with a Gaussian weight, so the result
+    ignores color order and changes smoothly as colors move.
+    Returns a (len(palettes), len(ANCHORS)) float32 array.
+    """
+    sizes = np.array([len(p) for p in palettes])
+    out = np.zeros((len(palettes), len(ANCHORS)), dtype=np.float32)
+    if not sizes.sum():
+        return out
+    lab = rgb_to_oklab(hex_to_rgb_array([c for p in palettes for c in p]) / 255.0)
+    d2 = ((lab[:, None, :] - ANCHORS[None, :, :]) ** 2).sum(axis=-1)
+    votes = np.exp(-d2 / (2 * SIGMA ** 2))
+    votes /= votes.sum(axis=1, keepdims=True) + 1e-12
+    nonempty = sizes > 0
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])[nonempty]
+    hist = np.add.reduceat(votes, starts, axis=0)
+    hist /= np.linalg.norm(hist, axis=1, keepdims=True) + 1e-12
+    out[nonempty] = hist
+    return out
+
+def embed_palette(palette):
+    return embed_palettes([palette])[0]
+
+class PaletteIndex:
+    """
+    Approximate nearest-neighbor index over palette embeddings using
+    random-hyperplane LSH (cosine similarity). Inserts are O(tables);
+    queries gather candidates from the matching buckets, probing buckets
+    one bit away as well, and rerank them exactly. With a limit, the oldest
+    entries are dropped once it is exceeded, a quarter at a time.
+    """
+
+    def __init__(self, tables=6, bits=10, seed=0, min_candidates=64, limit=None):
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((tables, bits, len(ANCHORS))).astype(np.float32)
+        self.buckets = [{} for _ in range(tables)]
+        self.min_candidates = min_candidates
+        self.limit = limit
+        self.added = 0  # palettes ever added, including dropped ones
+        self.keys = []
+        self.palettes = []
+        self._vectors = np.empty((0, len(ANCHORS)), dtype=np.float32)
+        self._pending = []
+        self._weights = 1 << np.arange(bits)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def vectors(self):
+        if self._pending:
+            self._vectors = np.concatenate([self._vectors] + self._pending)
+            self._pending = []
+        return self._vectors
+
+    def _codes(self, vectors):
+        # (tables, n) integer bucket codes
+        bits = np.einsum('tbd,nd->tnb', self.planes, vectors) > 0
+        return bits.astype(np.int64) @ self._weights
+
+    def add_many(self, keys, palettes):
+        keys, palettes = list(keys), list(palettes)
+        if not keys:
+            return
+        vectors = embed_palettes(palettes)
+        start = len(self.keys)
+        codes = self._codes(vectors)
+        for t, table in enumerate(self.buckets):
+            for offset, code in enumerate(codes[t].tolist()):
+                table.setdefault(code, []).append(start + offset)
+        self.keys.extend(keys)
+        self.palettes.extend(list(p) for p in palettes)
+        self._pending.append(vectors)
+        self.added += len(keys)
+        if self.limit and len(self.keys) > self.limit:
+            self._drop_oldest(len(self.keys) - self.limit * 3 // 4)
+
+    def _drop_oldest(self, count):
+        # Rebuild the buckets over the survivors, reusing their embeddings
+        vectors = self.vectors[count:].copy()
+        self.keys, self.palettes = self.keys[count:], self.palettes[count:]
+        self._vectors = vectors
+        self.buckets = [{} for _ in self.buckets]
+        codes = self._codes(vectors)
+        for t, table in enumerate(self.buckets):
+            for i, code in enumerate(codes[t].tolist()):
+                table.setdefault(code, []).append(i)
+
+    def add(self, key, palette):
+        self.add_many([key], [palette])
+
+    def reindex(self, items):
+        # Rebuild from scratch from (key, palette) pairs in one batch
+        items = list(items)
+        self.buckets = [{} for _ in self.buckets]
+        self.keys, self.palettes = [], []
+        self._vectors = np.empty((0, len(ANCHORS)), dtype=np.float32)
+        self._pending = []
+        self.added = 0
+        self.add_many([k for k, _ in items], [p for _, p in items])
+
+    def _candidates(self, vector):
+        codes = self._codes(vector[None, :])[:, 0]
+        bits = len(self._weights)
+        found = set()
+        for t, table in enumerate(self.buckets):
+            found.update(table.get(int(codes[t]), ()))
+        if len(found) < self.min_candidates:
+            for t, table in enumerate(self.buckets):
+                for b in range(bits):
+                    found.update(table.get(int(codes[t]) ^ (1 << b), ()))
+        return found
+
+    def query(self, palette, k=5, exclude=None):
+        """
+        Return up to k (key, palette, similarity) tuples, most similar first.
+        Falls back to an exact scan when the buckets hold too few candidates.
+        """
+        if not self.keys:
+            return []
+        vector = embed_palette(palette)
+        candidates = self._candidates(vector)
+        if len(candidates) < min(self.min_candidates, len(self.keys)):
+            idx = np.arange(len(self.keys))
+        else:
+            idx = np.fromiter(candidates, dtype=np.int64)
+        scores = self.vectors[idx] @ vector
+        order = np.argsort(-scores, kind='stable')
+        results = []
+        for i in order:
+            key = self.keys[idx[i]]
+            if exclude is not None and key == exclude:
+                continue
+            results.append((key, self.palettes[idx[i]], float(scores[i])))
+            if len(results) >= k:
+                break
+        return results
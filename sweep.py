@@ -0,0 +1,182 @@
+# sweep.py - Animated slider sweeps (GIF, APNG, raw RGB frames)
+#
+# Usage:
+#   python sweep.py '#45B1E8' triadic --param hue_shift --frames 100 -o sweep.gif
+#   python sweep.py '#45B1E8' warm --format rgb | ffmpeg -f rawvideo -pix_fmt rgb24 -s 400x120 -r 25 -i - sweep.mp4
+#
+# A frame is the palette drawn as equal-width vertical stripes. The stripe
+# layout depends only on the palette length, so each length is rasterized once
+# into an index buffer; frames only swap the colors behind it. GIF frames reuse
+# that buffer's LZW data outright, APNG frames are expanded into one reused RGB
+# row. Writers yield bytes, so memory stays flat however many frames there are.
+import argparse
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from colorspace import hex_to_rgb_array
+from utils import STYLE_REGISTRY, generate_palette
+
+SWEEP_PARAMS = ('hue_shift', 'saturation_boost')
+WIDTH, HEIGHT = 400, 120
+FPS = 25
+
+def sweep_palettes(base_hex, style, num_colors=5, param='hue_shift', start=0.0, stop=1.0, frames=100,
+                   hue_shift=0.1, saturation_boost=0.5, space='hsl', seed=0):
+    """
+    Palettes for frames evenly spaced values of param from start to stop, the
+    other slider held fixed. Randomized styles reuse seed on every frame so
+    the animation follows the slider rather than fresh random draws.
+    """
+    if param not in SWEEP_PARAMS:
+        raise ValueError(f"Can only sweep {', '.join(SWEEP_PARAMS)}")
+    entry = STYLE_REGISTRY.get(style)
+    seed = None if entry is not None and entry['deterministic'] else seed
+    values = np.linspace(start, stop, frames).tolist()
+    settings = {'hue_shift': hue_shift, 'saturation_boost': saturation_boost}
+    palettes = []
+    for value in values:
+        settings[param] = value
+        palettes.append(generate_palette(base_hex, style, num_colors, space=space, seed=seed, **settings))
+    return palettes
+
+def _stripes(n, width):
+    # Column -> swatch index for n equal-width stripes
+    return (np.arange(width) * n // width).astype(np.uint8)
+
+def _lzw(indices, min_size):
+    # GIF variable-width LZW, with a clear code whenever the 12-bit table fills
+    clear, eoi = 1 << min_size, (1 << min_size) + 1
+    out = bytearray()
+    acc = bits = 0
+    size, next_code, table = min_size + 1, eoi + 1, {}
+
+    def emit(code):
+        nonlocal acc, bits, size
+        acc |= code << bits
+        bits += size
+        while bits >= 8:
+            out.append(acc & 0xFF)
+            acc >>= 8
+            bits -= 8
+        if next_code >= 1 << size and size < 12:
+            size += 1
+
+    emit(clear)
+    it = iter(indices)
+    w = next(it)
+    for k in it:
+        wk = (w, k)
+        code = table.get(wk)
+        if code is not None:
+            w = code
+            continue
+        emit(w)
+        if next_code < 4095:
+            table[wk] = next_code
+            next_code += 1
+        else:
+            emit(clear)
+            size, next_code, table = min_size + 1, eoi + 1, {}
+        w = k
+    emit(w)
+    emit(eoi)
+    if bits:
+        out.append(acc & 0xFF)
+    return bytes(out)
+
+def _sub_blocks(data):
+    return b''.join(bytes([len(data[i:i + 255])]) + data[i:i + 255] for i in range(0, len(data), 255)) + b'\0'
+
+def write_gif(palettes, width=WIDTH, height=HEIGHT, fps=FPS):
+    yield b'GIF89a' + struct.pack('<HHBBB', width, height, 0, 0, 0)
+    yield b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00'  # loop forever
+    delay = max(1, round(100 / fps))
+    encoded = {}
+    for palette in palettes:
+        n = len(palette)
+        if n not in encoded:
+            table_bits = max(1, (n - 1).bit_length())
+            index = np.tile(_stripes(n, width), height)
+            encoded[n] = (table_bits, bytes([max(2, table_bits)]) + _sub_blocks(_lzw(index.tolist(), max(2, table_bits))))
+        table_bits, data = encoded[n]
+        colors = np.zeros((1 << table_bits, 3), dtype=np.uint8)
+        colors[:n] = hex_to_rgb_array(palette)
+        yield (b'\x21\xf9\x04\x00' + struct.pack('<H', delay) + b'\x00\x00'
+               + b'\x2c' + struct.pack('<HHHHB', 0, 0, width, height, 0x80 | (table_bits - 1))
+               + colors.tobytes() + data)
+    yield b'\x3b'
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+def write_apng(palettes, width=WIDTH, height=HEIGHT, fps=FPS):
+    palettes = list(palettes)
+    yield b'\x89PNG\r\n\x1a\n'
+    yield _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+    yield _png_chunk(b'acTL', struct.pack('>II', len(palettes), 0))
+    row = np.zeros(1 + 3 * width, dtype=np.uint8)  # filter byte 0, then RGB
+    pixels = row[1:].reshape(width, 3)
+    sequence = 0
+    for i, palette in enumerate(palettes):
+        yield _png_chunk(b'fcTL', struct.pack('>IIIIIHHBB', sequence, width, height, 0, 0, 1, fps, 0, 0))
+        sequence += 1
+        np.take(hex_to_rgb_array(palette), _stripes(len(palette), width), axis=0, out=pixels)
+        data = zlib.compress(row.tobytes() * height, 6)
+        if i == 0:
+            yield _png_chunk(b'IDAT', data)
+        else:
+            yield _png_chunk(b'fdAT', struct.pack('>I', sequence) + data)
+            sequence += 1
+    yield _png_chunk(b'IEND', b'')
+
+def iter_frames(palettes, width=WIDTH, height=HEIGHT):
+    # The same (height, width, 3) buffer every time; copy it to keep a frame
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    for palette in palettes:
+        np.take(hex_to_rgb_array(palette), _stripes(len(palette), width), axis=0, out=frame[0])
+        frame[1:] = frame[0]
+        yield frame
+
+def write_raw(palettes, width=WIDTH, height=HEIGHT, fps=FPS):
+    # rgb24 frames back to back, for ffmpeg -f rawvideo
+    for frame in iter_frames(palettes, width, height):
+        yield frame.tobytes()
+
+FORMATS = {'gif': write_gif, 'apng': write_apng, 'rgb': write_raw}
+EXTENSIONS = {'gif': 'gif', 'apng': 'png', 'rgb': 'rgb'}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render a slider sweep as an animation')
+    parser.add_argument('base_hex')
+    parser.add_argument('style')
+    parser.add_argument('--param', choices=SWEEP_PARAMS, default='hue_shift')
+    parser.add_argument('--start', type=float, default=0.0)
+    parser.add_argument('--stop', type=float, default=1.0)
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--num-colors', type=int, default=5)
+    parser.add_argument('--hue-shift', type=float, default=0.1)
+    parser.add_argument('--saturation-boost', type=float, default=0.5)
+    parser.add_argument('--fps', type=int, default=FPS)
+    parser.add_argument('--size', default=f'{WIDTH}x{HEIGHT}', help='WIDTHxHEIGHT')
+    parser.add_argument('--format', choices=list(FORMATS))
+    parser.add_argument('-o', '--output', help='default: stdout')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or next((f for f, ext in EXTENSIONS.items() if args.output and args.output.endswith('.' + ext)), 'gif')
+    width, height = (int(v) for v in args.size.split('x'))
+    palettes = sweep_palettes(args.base_hex, args.style, args.num_colors, args.param, args.start, args.stop,
+                              args.frames, args.hue_shift, args.saturation_boost)
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in FORMATS[fmt](palettes, width, height, args.fps):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# tokens.py - Design-token scales (50-900) for every library color, with contrast annotations
+#
+# Usage:
+#   python tokens.py                                  # write tokens.css and tokens.json for COLORS
+#   python tokens.py --css out.css --json out.json
+#
+# Scales are cached in tokens_cache.npz next to the outputs; a rerun only
+# recomputes colors whose hex changed or that are new.
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from colors import COLORS
+from colorspace import hex_to_rgb_array, rgb_array_to_hex, rgb_to_oklab, oklab_to_oklch, oklch_to_rgb_mapped, srgb_to_linear, to_uint8
+from export import _slug
+
+STEPS = (50, 100, 200, 300, 400, 500, 600, 700, 800, 900)
+# OKLab lightness per step: the same ladder for every color, so step 500 of
+# one hue is as light as step 500 of any other
+LIGHTNESS = np.array([0.97, 0.93, 0.87, 0.79, 0.70, 0.62, 0.54, 0.46, 0.38, 0.30])
+# Share of the base chroma kept per step; pale and deep ends are less saturated
+CHROMA = np.array([0.15, 0.30, 0.55, 0.80, 0.95, 1.00, 0.95, 0.85, 0.70, 0.55])
+AA = 4.5  # WCAG AA contrast for body text
+CACHE_PATH = 'tokens_cache.npz'
+
+def relative_luminance(rgb):
+    return srgb_to_linear(np.asarray(rgb, dtype=np.float64) / 255.0) @ np.array([0.2126, 0.7152, 0.0722])
+
+def build_scales(rgb):
+    """
+    (N, 3) uint8 base colors -> (N, 10, 3) uint8 scales. Each step takes its
+    lightness from LIGHTNESS, keeps the base hue and scales the base chroma
+    by CHROMA; out-of-gamut steps lose chroma, not lightness or hue.
+    """
+    lch = oklab_to_oklch(rgb_to_oklab(np.asarray(rgb, dtype=np.float64).reshape(-1, 3) / 255.0))
+    steps = np.empty((len(lch), len(STEPS), 3))
+    steps[..., 0] = LIGHTNESS
+    steps[..., 1] = lch[:, 1:2] * CHROMA
+    steps[..., 2] = lch[:, 2:3]
+    return to_uint8(oklch_to_rgb_mapped(steps))
+
+def contrast(scales):
+    """
+    WCAG contrast ratio of every step against white and black, (..., 2).
+    """
+    lum = relative_luminance(scales)
+    return np.stack([1.05 / (lum + 0.05), (lum + 0.05) / 0.05], axis=-1)
+
+class TokenScales:
+    """
+    Scales for a list of named colors. refresh() recomputes only the rows
+    whose color is new or changed, in one vectorized pass over those rows.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.rgb = np.empty((0, 3), dtype=np.uint8)
+        self.scales = np.empty((0, len(STEPS), 3), dtype=np.uint8)
+        self.contrast = np.empty((0, len(STEPS), 2))
+
+    def __len__(self):
+        return len(self.names)
+
+    def refresh(self, colors):
+        # colors: dicts with 'name' and 'hex'. Returns how many rows were recomputed.
+        names = _unique_slugs(c['name'] for c in colors)
+        rgb = hex_to_rgb_array([c['hex'] for c in colors])
+        previous = {name: i for i, name in enumerate(self.names)}
+        old = np.array([previous.get(name, -1) for name in names], dtype=np.int64)
+        reuse = old >= 0
+        reuse[reuse] = (self.rgb[old[reuse]] == rgb[reuse]).all(axis=1)
+        scales = np.empty((len(names), len(STEPS), 3), dtype=np.uint8)
+        ratios = np.empty((len(names), len(STEPS), 2))
+        scales[reuse] = self.scales[old[reuse]]
+        ratios[reuse] = self.contrast[old[reuse]]
+        stale = ~reuse
+        if stale.any():
+            scales[stale] = build_scales(rgb[stale])
+            ratios[stale] = contrast(scales[stale])
+        self.names, self.rgb, self.scales, self.contrast = names, rgb, scales, ratios
+        return int(stale.sum())
+
+    def save(self, path=CACHE_PATH):
+        np.savez(path, names=np.array(self.names), rgb=self.rgb, scales=self.scales, contrast=self.contrast)
+
+    @classmethod
+    def load(cls, path=CACHE_PATH):
+        table = cls()
+        try:
+            with np.load(path) as data:
+                table.names = data['names'].tolist()
+                table.rgb, table.scales, table.contrast = data['rgb'], data['scales'], data['contrast']
+        except (OSError, KeyError, ValueError):
+            pass
+        return table
+
+def _unique_slugs(names):
+    seen = {}
+    out = []
+    for name in names:
+        slug = _slug(name)
+        seen[slug] = seen.get(slug, 0) + 1
+        out.append(slug if seen[slug] == 1 else f"{slug}-{seen[slug]}")
+    return out
+
+def to_css(names, scales, prefix='color'):
+    # One custom property per step: --color-<name>-<step>
+    hexes = rgb_array_to_hex(scales)
+    lines = [":root {"]
+    for i, name in enumerate(names):
+        for j, step in enumerate(STEPS):
+            lines.append(f"  --{prefix}-{name}-{step}: {hexes[i * len(STEPS) + j]};")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def to_json(names, scales, ratios):
+    """
+    W3C design-tokens JSON. Each step carries its contrast against white and
+    black and the text color that reads better on it.
+    """
+    hexes = rgb_array_to_hex(scales)
+    ratios = np.round(ratios, 2).tolist()
+    tokens = {}
+    for i, name in enumerate(names):
+        group = {}
+        for j, step in enumerate(STEPS):
+            white, black = ratios[i][j]
+            group[str(step)] = {
+                '$type': 'color',
+                '$value': hexes[i * len(STEPS) + j],
+                '$extensions': {'contrast': {
+                    'white': white, 'black': black,
+                    'text': 'white' if white >= black else 'black',
+                    'aa': max(white, black) >= AA,
+                }},
+            }
+        tokens[name] = group
+    return json.dumps({'color': tokens}, indent=2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate 50-900 design-token scales for the color library')
+    parser.add_argument('--css', default='tokens.css')
+    parser.add_argument('--json', default='tokens.json')
+    parser.add_argument('--cache', default=CACHE_PATH)
+    args = parser.parse_args(argv)
+
+    table = TokenScales.load(args.cache)
+    changed = table.refresh(COLORS)
+    table.save(args.cache)
+    with open(args.css, 'w') as f:
+        f.write(to_css(table.names, table.scales))
+    with open(args.json, 'w') as f:
+        f.write(to_json(table.names, table.scales, table.contrast))
+    print(f"{len(table)} colors, {changed} recomputed; wrote {args.css} and {args.json}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
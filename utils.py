@@ -1,6 +1,16 @@
 import colorsys
+import contextvars
+import hashlib
+import json
+import os
 import random
+from contextlib import contextmanager
+
+import numpy as np
+
 from colors import COLORS
+from colorspace import hex_to_rgb_array, hls_to_uint8, oklch_to_rgb_mapped, oklch_to_rgb8, rgb8_to_oklch, to_uint8
+from colormap import build_ramp
 
 # WES ANDERSON INSPIRED HARD-CODED PALETTES (FROM SEARCH)
 WES_PALETTES = [
@@ -17,12 +27,63 @@ def hex_to_rgb(hex_str):
 def rgb_to_hex(rgb):
     return '#%02x%02x%02x' % rgb
 
+# WORKING SPACE: the style rules do their arithmetic on (hue, lightness, saturation)
+# triples in [0, 1]. In 'hsl' those are colorsys HLS; in 'oklch' they are OKLCh
+# hue / 360, L and C / OKLCH_CHROMA_MAX, converted back with chroma gamut mapping.
+# generate_palette(space=...) selects one per call.
+GENERATION_SPACES = ('hsl', 'oklch')
+OKLCH_CHROMA_MAX = 0.32  # about the largest chroma sRGB reaches
+_working_space = contextvars.ContextVar('working_space', default='hsl')
+
+@contextmanager
+def working_space(space):
+    if space not in GENERATION_SPACES:
+        raise ValueError(f"Unknown color space: {space}")
+    token = _working_space.set(space)
+    try:
+        yield
+    finally:
+        _working_space.reset(token)
+
+# RANDOMNESS: style rules draw from style_random(). A seeded generate_palette
+# call installs its own random.Random(seed) for the duration of the call, so
+# its draws never interleave with other threads' and the shared stream is
+# left alone; unseeded calls use the random module as before.
+_style_random = contextvars.ContextVar('style_random', default=None)
+
+def style_random():
+    return _style_random.get() or random
+
+@contextmanager
+def seeded_random(seed):
+    token = _style_random.set(random.Random(seed))
+    try:
+        yield
+    finally:
+        _style_random.reset(token)
+
 def rgb_to_hsl(rgb):
+    if _working_space.get() == 'oklch':
+        lightness, chroma, hue = rgb8_to_oklch(rgb)
+        return (hue / 360.0, lightness, chroma / OKLCH_CHROMA_MAX)
     r, g, b = [x / 255.0 for x in rgb]
     return colorsys.rgb_to_hls(r, g, b)
 
 def hsl_to_rgb(hsl):
-    return tuple(int(x * 255) for x in colorsys.hls_to_rgb(*hsl))
+    if _working_space.get() == 'oklch':
+        return oklch_to_rgb8(hsl[1], hsl[2] * OKLCH_CHROMA_MAX, hsl[0] * 360.0)
+    # Out-of-range lightness from the style rules would otherwise format as
+    # invalid hex such as '#00-10-d' or '#95101f3'; clamp the way
+    # colorspace.hls_to_uint8 does, so scalar and batch paths agree
+    return tuple(min(255, max(0, int(x * 255))) for x in colorsys.hls_to_rgb(*hsl))
+
+def hls_array_to_uint8(hls):
+    # Vectorized hsl_to_rgb for the current working space: (..., 3) triples -> uint8
+    if _working_space.get() == 'oklch':
+        hls = np.asarray(hls, dtype=np.float64)
+        lch = np.stack([hls[..., 1], hls[..., 2] * OKLCH_CHROMA_MAX, hls[..., 0] * 360.0], axis=-1)
+        return to_uint8(oklch_to_rgb_mapped(lch))
+    return hls_to_uint8(hls)
 
 def complementary_color(hex_color):
     rgb = hex_to_rgb(hex_color)
@@ -60,7 +121,7 @@ def monochrome_colors(hex_color, num=4):
     return monos
 
 def wes_anderson_colors(base_hex, num=5, saturation_boost=0.5):
-    wes = random.choice(WES_PALETTES)
+    wes = style_random().choice(WES_PALETTES)
     rgb = hex_to_rgb(base_hex)
     base_hsl = rgb_to_hsl(rgb)
     adjusted = []
@@ -69,7 +130,7 @@ def wes_anderson_colors(base_hex, num=5, saturation_boost=0.5):
         c_hsl = rgb_to_hsl(c_rgb)
         adj_hsl = (base_hsl[0], min(1.0, c_hsl[1] * (0.8 + saturation_boost)), c_hsl[2] * 0.9)
         adjusted.append(rgb_to_hex(hsl_to_rgb(adj_hsl)))
-    return random.sample(adjusted, min(num, len(adjusted)))
+    return style_random().sample(adjusted, min(num, len(adjusted)))
 
 def warm_colors(hex_color, num=5, hue_shift=0.0833, saturation_boost=0.5):
     rgb = hex_to_rgb(hex_color)
@@ -77,7 +138,7 @@ def warm_colors(hex_color, num=5, hue_shift=0.0833, saturation_boost=0.5):
     warm_h = hue_shift  # Shift to orange/red
     warm = []
     for i in range(num):
-        w_hsl = ((hsl[0] + warm_h) % 1.0, min(1.0, hsl[1] + saturation_boost * (random.random() - 0.5)), hsl[2] + i*0.05 - 0.1)
+        w_hsl = ((hsl[0] + warm_h) % 1.0, min(1.0, hsl[1] + saturation_boost * (style_random().random() - 0.5)), hsl[2] + i*0.05 - 0.1)
         warm.append(rgb_to_hex(hsl_to_rgb(w_hsl)))
     return warm
 
@@ -200,8 +261,8 @@ def split_analogous_colors(hex_color, num=5, hue_shift=0.1667, saturation_boost=
     for i in range(1, num):
         offset = hue_shift if i % 2 == 0 else -hue_shift  # ±60°
         new_h = (hsl[0] + (i // 2) * offset) % 1.0
-        new_s = min(1.0, hsl[1] + saturation_boost * (random.random() - 0.5))
-        new_l = min(1.0, hsl[2] + (random.random() - 0.5) * 0.2)
+        new_s = min(1.0, hsl[1] + saturation_boost * (style_random().random() - 0.5))
+        new_l = min(1.0, hsl[2] + (style_random().random() - 0.5) * 0.2)
         rgb = hsl_to_rgb((new_h, new_s, new_l))
         analogs.append(rgb_to_hex(rgb))
     return [hex_color] + analogs[:num-1]
@@ -214,8 +275,8 @@ def double_complementary_colors(hex_color, num=5, hue_shift=0.0417, saturation_b
     for i in range(1, num):
         base_offset = 0.5 if i % 2 == 0 else hue_shift * (1 if i % 4 < 2 else -1)  # ±15°
         new_h = (hsl[0] + base_offset + (i // 2) * hue_shift) % 1.0
-        new_s = min(1.0, hsl[1] + saturation_boost * (random.random() - 0.5))
-        new_l = min(1.0, hsl[2] + (random.random() - 0.5) * 0.2)
+        new_s = min(1.0, hsl[1] + saturation_boost * (style_random().random() - 0.5))
+        new_l = min(1.0, hsl[2] + (style_random().random() - 0.5) * 0.2)
         rgb = hsl_to_rgb((new_h, new_s, new_l))
         doubles.append(rgb_to_hex(rgb))
     return [hex_color] + doubles[:num-1]
@@ -226,89 +287,327 @@ def golden_ratio_colors(hex_color, num=5, hue_shift=0.618033988749895, saturatio
     golden = []
     for i in range(1, num):
         new_h = (hsl[0] + i * hue_shift) % 1.0
-        new_s = min(1.0, hsl[1] + saturation_boost * (random.random() - 0.5))
-        new_l = min(1.0, hsl[2] + (random.random() - 0.5) * 0.2)
+        new_s = min(1.0, hsl[1] + saturation_boost * (style_random().random() - 0.5))
+        new_l = min(1.0, hsl[2] + (style_random().random() - 0.5) * 0.2)
         rgb = hsl_to_rgb((new_h, new_s, new_l))
         golden.append(rgb_to_hex(rgb))
     return [hex_color] + golden[:num-1]
 
+# BATCH GENERATORS for the randomized styles: the same rules as above, drawing
+# count candidates at once from a numpy Generator. Each returns a list of
+# (head, hls) pairs: head is the hex colors every candidate starts with (the
+# base color, kept verbatim) and hls a (count_i, n_i, 3) array of raw colorsys
+# (h, l, s) triples for the rest, before any clamping, so callers can see when
+# a rule left the valid range. Like the scalar versions they index
+# rgb_to_hsl's result positionally.
+def _batch(count, hues, second, third, head=()):
+    shape = np.broadcast_shapes(np.shape(hues), np.shape(second), np.shape(third))
+    out = np.stack([np.broadcast_to(x, shape) for x in (hues, second, third)], axis=-1)
+    return [(list(head), np.broadcast_to(out, (count,) + out.shape[-2:]))]
+
+def _jitter(hsl, count, n, saturation_boost, rng):
+    # new_s / new_l as in split_analogous, double_complementary and golden_ratio
+    second = np.minimum(1.0, hsl[1] + saturation_boost * (rng.random((count, n)) - 0.5))
+    third = np.minimum(1.0, hsl[2] + (rng.random((count, n)) - 0.5) * 0.2)
+    return second, third
+
+def wes_anderson_batch(base_hex, num, hue_shift, saturation_boost, count, rng):
+    base_hsl = rgb_to_hsl(hex_to_rgb(base_hex))
+    picks = rng.integers(len(WES_PALETTES), size=count)
+    batches = []
+    for p, wes in enumerate(WES_PALETTES):
+        k = int((picks == p).sum())
+        if not k:
+            continue
+        c_hsl = np.array([rgb_to_hsl(hex_to_rgb(c)) for c in wes])
+        adjusted = np.column_stack([
+            np.full(len(wes), base_hsl[0]), np.minimum(1.0, c_hsl[:, 1] * (0.8 + saturation_boost)), c_hsl[:, 2] * 0.9,
+        ])
+        # random.sample per candidate: the first m entries of a random permutation
+        order = np.argsort(rng.random((k, len(wes))), axis=1)[:, :min(num, len(wes))]
+        batches.append(([], adjusted[order]))
+    return batches
+
+def warm_batch(hex_color, num, hue_shift, saturation_boost, count, rng):
+    hsl = rgb_to_hsl(hex_to_rgb(hex_color))
+    second = np.minimum(1.0, hsl[1] + saturation_boost * (rng.random((count, num)) - 0.5))
+    third = hsl[2] + np.arange(num) * 0.05 - 0.1
+    return _batch(count, (hsl[0] + hue_shift) % 1.0, second, third)
+
+def split_analogous_batch(hex_color, num, hue_shift, saturation_boost, count, rng):
+    hsl = rgb_to_hsl(hex_to_rgb(hex_color))
+    i = np.arange(1, num)
+    offset = np.where(i % 2 == 0, hue_shift, -hue_shift)
+    return _batch(count, (hsl[0] + (i // 2) * offset) % 1.0, *_jitter(hsl, count, num - 1, saturation_boost, rng), head=[hex_color])
+
+def double_complementary_batch(hex_color, num, hue_shift, saturation_boost, count, rng):
+    hsl = rgb_to_hsl(hex_to_rgb(hex_color))
+    i = np.arange(1, num)
+    base_offset = np.where(i % 2 == 0, 0.5, hue_shift * np.where(i % 4 < 2, 1, -1))
+    hues = (hsl[0] + base_offset + (i // 2) * hue_shift) % 1.0
+    return _batch(count, hues, *_jitter(hsl, count, num - 1, saturation_boost, rng), head=[hex_color])
+
+def golden_ratio_batch(hex_color, num, hue_shift, saturation_boost, count, rng):
+    hsl = rgb_to_hsl(hex_to_rgb(hex_color))
+    i = np.arange(1, num)
+    return _batch(count, (hsl[0] + i * hue_shift) % 1.0, *_jitter(hsl, count, num - 1, saturation_boost, rng), head=[hex_color])
+
+# Precomputed by clustering.py: hue/lightness buckets with near-duplicates removed
+META_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'color_meta.json')
+
+def library_digest(hexes):
+    return hashlib.sha1("".join(h.upper() for h in hexes).encode('ascii')).hexdigest()
+
+_balanced = None
+
+def balanced_buckets():
+    """
+    Lists of library hexes per bucket from color_meta.json, or None when the
+    file is missing or was built for a different COLORS list.
+    """
+    global _balanced
+    if _balanced is None:
+        _balanced = []
+        try:
+            with open(META_PATH) as f:
+                meta = json.load(f)
+            if meta.get('library_digest') == library_digest([c['hex'] for c in COLORS]):
+                _balanced = [[COLORS[i]['hex'] for i in idx] for idx in meta['buckets'].values() if idx]
+        except (OSError, ValueError, KeyError, IndexError):
+            pass
+    return _balanced or None
+
+def sample_library(num, exclude=()):
+    """
+    Draw num distinct library colors. With bucket metadata each draw picks a
+    bucket first, so clumps of similar colors in COLORS don't dominate, at
+    O(1) per color; otherwise fall back to a uniform sample.
+    """
+    buckets = balanced_buckets()
+    excluded = {h.upper() for h in exclude}
+    if not buckets:
+        pool = [c['hex'] for c in COLORS if c['hex'].upper() not in excluded]
+        return style_random().sample(pool, min(num, len(pool)))
+    picked = []
+    order = style_random().sample(range(len(buckets)), len(buckets))
+    attempts = 0
+    while len(picked) < num and attempts < num * 8:
+        bucket = buckets[order[attempts % len(order)]]
+        attempts += 1
+        color = style_random().choice(bucket)
+        if color.upper() not in excluded:
+            excluded.add(color.upper())
+            picked.append(color)
+    if len(picked) < num:
+        pool = [c['hex'] for c in COLORS if c['hex'].upper() not in excluded]
+        picked += style_random().sample(pool, min(num - len(picked), len(pool)))
+    return picked
+
+_theme_pools = {}
+
+def _theme_pool(theme):
+    # Library hexes whose vibe or story mentions theme, built once per theme
+    pool = _theme_pools.get(theme)
+    if pool is None:
+        pool = [c['hex'] for c in COLORS if theme in c['vibe'].lower() or theme in c['why_underrated'].lower()]
+        _theme_pools[theme] = pool
+    return pool
+
 def random_harmony_colors(hex_color, num=5):
     base_color = next((c for c in COLORS if c['hex'].upper() == hex_color.upper()), None)
     if base_color:
-        theme = random.choice([base_color['vibe'], base_color['why_underrated']]).lower()
-        similar_colors = [c for c in COLORS if theme in c['vibe'].lower() or theme in c['why_underrated'].lower()]
+        theme = style_random().choice([base_color['vibe'], base_color['why_underrated']]).lower()
+        similar_colors = _theme_pool(theme)
         if similar_colors:
-            return [hex_color] + random.sample([c['hex'] for c in similar_colors], min(num-1, len(similar_colors)))
-    return [hex_color] + random.sample([c['hex'] for c in COLORS], min(num-1, len(COLORS)))
+            return [hex_color] + style_random().sample(similar_colors, min(num-1, len(similar_colors)))
+    return [hex_color] + sample_library(num-1, exclude=[hex_color])
 
 def biomimicry_colors(hex_color, num=5):
     ecosystems = ['coral', 'forest', 'desert', 'ocean', 'meadow']
-    theme = random.choice(ecosystems)
-    similar_colors = [c for c in COLORS if theme in c['vibe'].lower() or theme in c['why_underrated'].lower()]
+    theme = style_random().choice(ecosystems)
+    similar_colors = _theme_pool(theme)
     if similar_colors:
-        return [hex_color] + random.sample([c['hex'] for c in similar_colors], min(num-1, len(similar_colors)))
-    return [hex_color] + random.sample([c['hex'] for c in COLORS], min(num-1, len(COLORS)))
+        return [hex_color] + style_random().sample(similar_colors, min(num-1, len(similar_colors)))
+    return [hex_color] + sample_library(num-1, exclude=[hex_color])
+
+# STYLE REGISTRY
+# Every style is a descriptor dict; generate_palette dispatches through it in O(1).
+# Style functions take (base_hex, num_colors, hue_shift, saturation_boost).
+NUM_COLORS_PARAM = {'num_colors': (3, 20, 5)}
+HUE_PARAM = {'hue_shift': (0.0, 1.0, 0.1)}
+SAT_PARAM = {'saturation_boost': (0.0, 1.0, 0.5)}
 
-def generate_palette(base_hex, style='random', num_colors=5, hue_shift=0.1, saturation_boost=0.5):
+STYLE_REGISTRY = {}
+
+def register_style(name, func, vectorized=None, deterministic=True, params=None, cacheable=None):
+    """
+    Register a palette style. vectorized is an optional batch implementation,
+    params maps each parameter the style reads to (min, max, default), and
+    cacheable defaults to deterministic. Re-registering a name replaces it.
+    """
+    STYLE_REGISTRY[name] = {
+        'name': name,
+        'func': func,
+        'vectorized': vectorized,
+        'deterministic': deterministic,
+        'params': dict(params if params is not None else NUM_COLORS_PARAM),
+        'cacheable': deterministic if cacheable is None else cacheable,
+    }
+    return STYLE_REGISTRY[name]
+
+def get_style(name):
+    return STYLE_REGISTRY.get(name)
+
+def style_names():
+    return list(STYLE_REGISTRY)
+
+def is_cacheable(name):
+    style = STYLE_REGISTRY.get(name)
+    return bool(style and style['cacheable'])
+
+def _random_palette(base_hex, num_colors, hue_shift, saturation_boost):
+    return sample_library(num_colors)
+
+_HUE = {**NUM_COLORS_PARAM, **HUE_PARAM}
+_SAT = {**NUM_COLORS_PARAM, **SAT_PARAM}
+_HUE_SAT = {**NUM_COLORS_PARAM, **HUE_PARAM, **SAT_PARAM}
+
+register_style('random', _random_palette, deterministic=False)
+register_style('complementary', lambda b, n, h, s: [b] + [complementary_color(b)] + analogous_colors(b, n-2, h), params=_HUE)
+register_style('analogous', lambda b, n, h, s: [b] + analogous_colors(b, n-1, h), params=_HUE)
+register_style('triadic', lambda b, n, h, s: [b] + triadic_colors(b) + analogous_colors(b, n-3, h), params=_HUE)
+register_style('monochrome', lambda b, n, h, s: [b] + monochrome_colors(b, n-1))
+register_style('wes_anderson', lambda b, n, h, s: wes_anderson_colors(b, n, s), vectorized=wes_anderson_batch, deterministic=False, params=_SAT)
+register_style('warm', lambda b, n, h, s: warm_colors(b, n, h, s), vectorized=warm_batch, deterministic=False, params=_HUE_SAT)
+register_style('cool', lambda b, n, h, s: cool_colors(b, n, h, s), params=_HUE_SAT)
+register_style('pastel', lambda b, n, h, s: pastel_colors(b, n, s), params=_SAT)
+register_style('vibrant', lambda b, n, h, s: vibrant_colors(b, n, s), params=_SAT)
+register_style('earth_tones', lambda b, n, h, s: earth_tones(b, n, s), params=_SAT)
+register_style('split_complementary', lambda b, n, h, s: split_complementary_colors(b, n, h), params=_HUE)
+register_style('tetradic', lambda b, n, h, s: tetradic_colors(b)[:n])
+register_style('square', lambda b, n, h, s: square_colors(b)[:n])
+register_style('gradient', lambda b, n, h, s: gradient_colors(b, n))
+register_style('shades', lambda b, n, h, s: shades_colors(b, n))
+register_style('tints', lambda b, n, h, s: tints_colors(b, n))
+register_style('tones', lambda b, n, h, s: tones_colors(b, n, s), params=_SAT)
+register_style('neutral', lambda b, n, h, s: neutral_colors(b, n, s), params=_SAT)
+register_style('high_contrast', lambda b, n, h, s: high_contrast_colors(b, n, h), params=_HUE)
+register_style('split_analogous', lambda b, n, h, s: split_analogous_colors(b, n, h, s), vectorized=split_analogous_batch, deterministic=False, params=_HUE_SAT)
+register_style('double_complementary', lambda b, n, h, s: double_complementary_colors(b, n, h, s), vectorized=double_complementary_batch, deterministic=False, params=_HUE_SAT)
+register_style('golden_ratio', lambda b, n, h, s: golden_ratio_colors(b, n, h, s), vectorized=golden_ratio_batch, deterministic=False, params=_HUE_SAT)
+register_style('random_harmony', lambda b, n, h, s: random_harmony_colors(b, n), deterministic=False)
+register_style('biomimicry', lambda b, n, h, s: biomimicry_colors(b, n), deterministic=False)
+
+PLUGIN_GROUP = 'colorpallete.styles'
+
+def load_style_plugins(group=PLUGIN_GROUP):
+    """
+    Load third-party styles from installed entry points. Each entry point
+    resolves to a callable that receives register_style and registers its styles.
+    Randomized plugin styles should draw from style_random() so seeds apply.
+    Returns the names of plugins that loaded.
+    """
+    try:
+        from importlib.metadata import entry_points
+        eps = entry_points(group=group)
+    except Exception:
+        return []
+    loaded = []
+    for ep in eps:
+        try:
+            ep.load()(register_style)
+            loaded.append(ep.name)
+        except Exception:
+            continue  # A broken plugin must not take the built-in styles down
+    return loaded
+
+load_style_plugins()
+
+def generate_palette(base_hex, style='random', num_colors=5, hue_shift=0.1, saturation_boost=0.5, space='hsl', seed=None):
     """
     Generate a color palette based on the base hex color and style.
+    space picks the working space the style's rules run in (GENERATION_SPACES);
+    seed makes randomized styles reproducible.
     """
     # Ensure base_hex is uppercase for consistency
     base_hex = base_hex.upper()
     
-    if style == 'random':
-        return random.sample([c['hex'] for c in COLORS], min(num_colors, len(COLORS)))
-    elif style == 'complementary':
-        return [base_hex] + [complementary_color(base_hex)] + analogous_colors(base_hex, num_colors-2, hue_shift)
-    elif style == 'analogous':
-        return [base_hex] + analogous_colors(base_hex, num_colors-1, hue_shift)
-    elif style == 'triadic':
-        return [base_hex] + triadic_colors(base_hex) + analogous_colors(base_hex, num_colors-3, hue_shift)
-    elif style == 'monochrome':
-        return [base_hex] + monochrome_colors(base_hex, num_colors-1)
-    elif style == 'wes_anderson':
-        return wes_anderson_colors(base_hex, num_colors, saturation_boost)
-    elif style == 'warm':
-        return warm_colors(base_hex, num_colors, hue_shift, saturation_boost)
-    elif style == 'cool':
-        return cool_colors(base_hex, num_colors, hue_shift, saturation_boost)
-    elif style == 'pastel':
-        return pastel_colors(base_hex, num_colors, saturation_boost)
-    elif style == 'vibrant':
-        return vibrant_colors(base_hex, num_colors, saturation_boost)
-    elif style == 'earth_tones':
-        return earth_tones(base_hex, num_colors, saturation_boost)
-    elif style == 'split_complementary':
-        return split_complementary_colors(base_hex, num_colors, hue_shift)
-    elif style == 'tetradic':
-        return tetradic_colors(base_hex)[:num_colors]
-    elif style == 'square':
-        return square_colors(base_hex)[:num_colors]
-    elif style == 'gradient':
-        return gradient_colors(base_hex, num_colors)
-    elif style == 'shades':
-        return shades_colors(base_hex, num_colors)
-    elif style == 'tints':
-        return tints_colors(base_hex, num_colors)
-    elif style == 'tones':
-        return tones_colors(base_hex, num_colors, saturation_boost)
-    elif style == 'neutral':
-        return neutral_colors(base_hex, num_colors, saturation_boost)
-    elif style == 'high_contrast':
-        return high_contrast_colors(base_hex, num_colors, hue_shift)
-    elif style == 'split_analogous':
-        return split_analogous_colors(base_hex, num_colors, hue_shift, saturation_boost)
-    elif style == 'double_complementary':
-        return double_complementary_colors(base_hex, num_colors, hue_shift, saturation_boost)
-    elif style == 'golden_ratio':
-        return golden_ratio_colors(base_hex, num_colors, hue_shift, saturation_boost)
-    elif style == 'random_harmony':
-        return random_harmony_colors(base_hex, num_colors)
-    elif style == 'biomimicry':
-        return biomimicry_colors(base_hex, num_colors)
+    if seed is not None:
+        with seeded_random(seed):
+            return generate_palette(base_hex, style, num_colors, hue_shift, saturation_boost, space)
+
+    entry = STYLE_REGISTRY.get(style)
+    if entry is not None:
+        with working_space(space):
+            return entry['func'](base_hex, num_colors, hue_shift, saturation_boost)
     
     # Fallback: Return base color with random colors
     palette = [base_hex]
     if num_colors > 1:
-        palette += random.sample([c['hex'] for c in COLORS], min(num_colors-1, len(COLORS)))
+        palette += style_random().sample([c['hex'] for c in COLORS], min(num_colors-1, len(COLORS)))
     return list(dict.fromkeys(palette))[:num_colors]  # Ensure unique colors
+
+# LARGE PALETTES: 256-4096 colors as packed (N, 3) uint8 arrays, never hex strings
+LARGE_SIZES = (256, 512, 1024, 2048, 4096)
+
+def generate_packed(base_hex, style='random', num_colors=1024, hue_shift=0.1, saturation_boost=0.5, rng=None, space='hsl'):
+    """
+    Generate a large palette as an (num_colors, 3) uint8 array. Styles with a
+    batch implementation apply their rule to every color directly; the rest
+    generate their usual palette and stretch it with an OKLab ramp.
+    """
+    base_hex = base_hex.upper()
+    entry = STYLE_REGISTRY.get(style)
+    if entry is not None and entry['vectorized'] is not None:
+        rng = np.random.default_rng() if rng is None else rng
+        with working_space(space):
+            head, hls = entry['vectorized'](base_hex, num_colors, hue_shift, saturation_boost, 1, rng)[0]
+            rgb = hls_array_to_uint8(hls[0])
+        if head:
+            rgb = np.concatenate([hex_to_rgb_array(head), rgb])
+        # wes_anderson is capped by its source palettes; ramp it like the rest
+        if len(rgb) >= num_colors:
+            return rgb[:num_colors]
+    seed = generate_palette(base_hex, style, NUM_COLORS_PARAM['num_colors'][1], hue_shift, saturation_boost, space)
+    return build_ramp(seed, num_colors, monotone=False, spacing='even')
+
+def regenerate_unlocked(palette, locked, base_hex, style='random', hue_shift=0.1, saturation_boost=0.5, space='hsl'):
+    """
+    Reroll every position of palette whose index is not in locked. Fresh colors
+    come from the style applied to the base color and then to each locked color,
+    so new swatches harmonize with the ones kept. Colors already in the palette
+    are skipped, and the library fills in if the style runs out of candidates.
+    """
+    locked = {i for i in locked if 0 <= i < len(palette)}
+    result = [palette[i] if i in locked else None for i in range(len(palette))]
+    open_slots = [i for i, c in enumerate(result) if c is None]
+    if not open_slots:
+        return result
+    taken = {c.upper() for c in palette}
+    fresh = []
+    anchors = [base_hex] + [palette[i] for i in sorted(locked)]
+    for anchor in anchors:
+        for c in generate_palette(anchor, style, len(palette), hue_shift, saturation_boost, space):
+            if c.upper() not in taken:
+                taken.add(c.upper())
+                fresh.append(c)
+        if len(fresh) >= len(open_slots):
+            break
+    if len(fresh) < len(open_slots):
+        pool = [c['hex'] for c in COLORS if c['hex'].upper() not in taken]
+        fresh += style_random().sample(pool, min(len(open_slots) - len(fresh), len(pool)))
+    for i, c in zip(open_slots, fresh):
+        result[i] = c
+    # Nothing left to draw from: keep the old color rather than leave a hole
+    return [c if c is not None else palette[i] for i, c in enumerate(result)]
+
+def palette_diff(old, new):
+    """
+    Return the indices where new differs from old, including positions
+    that exist in only one of them.
+    """
+    old = old or []
+    new = new or []
+    changed = [i for i, (a, b) in enumerate(zip(old, new)) if a.upper() != b.upper()]
+    changed += range(min(len(old), len(new)), max(len(old), len(new)))
+    return changed